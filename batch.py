@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+import tracing
+from main import generate_json_schema, response_cache
+from template_cache import template_cache
+from fast_path import fast_path_stats
+from scheduler import RateLimitScheduler
+from cascade import DEFAULT_TIERS, cascade_stats, generate_with_cascade
+
+def load_prompts(jsonl_path: str) -> List[Dict[str, Any]]:
+    """Load prompts from a JSONL file.
+
+    Each line is either a JSON string or an object with a "prompt" (or
+    "question"/"description") field, an optional "id"/"request_id" and an
+    optional "priority" (lower is sent first when rate limited).
+    """
+    prompts = []
+    with open(jsonl_path, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            prompt = record.get("prompt") or record.get("question") or record.get("description")
+            if not prompt:
+                print(f"Skipping line {line_number}: no prompt field")
+                continue
+            prompt_id = str(record.get("id") or record.get("request_id") or f"prompt_{line_number:05d}")
+            prompts.append({"id": prompt_id, "prompt": prompt, "priority": int(record.get("priority", 0))})
+    return prompts
+
+async def process_prompt(item: Dict[str, Any], semaphore: asyncio.Semaphore, output_dir: str, model_name: str, use_cache: bool = True, stream: bool = False,
+                         scheduler: Optional[RateLimitScheduler] = None, cascade_tiers: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Generate and save the scene JSON for a single prompt, through the rate limit scheduler or model cascade if given."""
+    async with semaphore:
+        start = time.perf_counter()
+        metrics = {}
+        try:
+            # generate_json_schema is blocking, so run it on a worker thread (which inherits the span context)
+            with tracing.span("parse", prompt_id=item["id"]):
+                if scheduler is not None:
+                    json_schema = await asyncio.wrap_future(scheduler.submit(
+                        item["prompt"], item.get("priority", 0), use_cache=use_cache, stream=stream, metrics=metrics
+                    ))
+                elif cascade_tiers:
+                    json_schema = await asyncio.to_thread(
+                        functools.partial(generate_with_cascade, item["prompt"], cascade_tiers, verbose=False,
+                                          use_cache=use_cache, stream=stream, metrics=metrics)
+                    )
+                else:
+                    json_schema = await asyncio.to_thread(
+                        functools.partial(generate_json_schema, item["prompt"], model_name, verbose=False,
+                                          use_cache=use_cache, stream=stream, metrics=metrics)
+                    )
+        except Exception as e:
+            print(f"[{item['id']}] Error: {e}")
+            return {"id": item["id"], "ok": False, "error": str(e), "seconds": time.perf_counter() - start, "metrics": metrics}
+
+    output_path = os.path.join(output_dir, f"{item['id']}.json")
+    with open(output_path, 'w') as f:
+        json.dump(json_schema, f, indent=2)
+    print(f"[{item['id']}] Saved {output_path}")
+    return {"id": item["id"], "ok": True, "output": output_path, "seconds": time.perf_counter() - start, "metrics": metrics}
+
+async def run_batch(prompts: List[Dict[str, Any]], output_dir: str, model_name: str, concurrency: int, use_cache: bool = True, stream: bool = False,
+                    scheduler: Optional[RateLimitScheduler] = None, cascade_tiers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Run generate_json_schema over all prompts with at most `concurrency` requests in flight.
+
+    With a scheduler every prompt is queued with it at once, so it can order
+    them by priority; it enforces its own in-flight limit. With cascade_tiers
+    each prompt goes through the model cascade instead of model_name alone.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore((len(prompts) or 1) if scheduler is not None else concurrency)
+    tasks = [process_prompt(item, semaphore, output_dir, model_name, use_cache, stream, scheduler, cascade_tiers)
+             for item in prompts]
+    return await asyncio.gather(*tasks)
+
+def main():
+    """Command line entry point for batch scene generation."""
+    parser = argparse.ArgumentParser(description="Generate scene JSON for every prompt in a JSONL file.")
+    parser.add_argument("jsonl_path", help="JSONL file with one prompt per line")
+    parser.add_argument("--output-dir", default="scenes", help="directory for the generated scene JSON files")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum number of LLM requests in flight")
+    parser.add_argument("--model", default="llama-3.1-8b-instant", help="model name passed to generate_json_schema")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the on-disk response cache")
+    parser.add_argument("--stream", action="store_true", help="stream completions and stop once the JSON object closes")
+    parser.add_argument("--report-usage", action="store_true", help="report cached vs. uncached prompt tokens from the API usage field")
+    parser.add_argument("--rpm", type=float, help="requests per minute budget; enables the rate limit scheduler")
+    parser.add_argument("--tpm", type=float, help="tokens per minute budget; enables the rate limit scheduler")
+    parser.add_argument("--cascade", action="store_true",
+                        help="try the cheapest model in $CASCADE_MODELS first, escalating only on invalid schemas")
+    parser.add_argument("--trace-dir", help="write span traces and Prometheus metrics here (default: $TRACE_DIR)")
+    args = parser.parse_args()
+    if args.cascade and (args.rpm or args.tpm):
+        parser.error("--cascade sends to several models and cannot be combined with --rpm/--tpm")
+    if args.trace_dir:
+        tracing.configure(args.trace_dir)
+
+    prompts = load_prompts(args.jsonl_path)
+    print(f"Processing {len(prompts)} prompts with concurrency {args.concurrency}")
+
+    scheduler = None
+    if args.rpm or args.tpm:
+        # An unset budget is effectively unlimited
+        scheduler = RateLimitScheduler(args.rpm or 1e9, args.tpm or 1e12, args.model, args.concurrency)
+
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(prompts, args.output_dir, args.model, args.concurrency, not args.no_cache, args.stream,
+                                  scheduler, DEFAULT_TIERS if args.cascade else None))
+    elapsed = time.perf_counter() - start
+    if scheduler is not None:
+        scheduler.shutdown()
+
+    succeeded = sum(1 for result in results if result["ok"])
+    print(f"\nDone in {elapsed:.2f}s: {succeeded} succeeded, {len(results) - succeeded} failed")
+    tokens_saved = sum(result["metrics"].get("few_shot_tokens_saved", 0) for result in results)
+    print(f"Few-shot selection saved ~{tokens_saved} prompt tokens vs keyword scan ({tokens_saved / max(1, len(results)):.0f} per request)")
+    stats = fast_path_stats.stats()
+    if stats["handled"]:
+        llm = [result["seconds"] for result in results
+               if result["ok"] and not result["metrics"].get("cache_hit") and not result["metrics"].get("fast_path")]
+        llm_seconds = f"{sum(llm) / len(llm):.2f}s" if llm else "n/a"
+        print(f"Fast path: {stats['handled']} of {stats['handled'] + stats['fallbacks']} prompts ({stats['share']:.1%}) "
+              f"parsed locally, mean {stats['mean_ms']:.2f}ms vs {llm_seconds} via the LLM")
+    reasks = sum(result["metrics"].get("schema_reasks", 0) for result in results)
+    if reasks:
+        reask_tokens_saved = sum(result["metrics"].get("reask_tokens_saved", 0) for result in results)
+        print(f"Schema re-asks: {reasks}, saving ~{reask_tokens_saved} tokens vs resending the full prompt")
+    if args.report_usage:
+        prompt_tokens = sum(result["metrics"].get("prompt_tokens", 0) for result in results)
+        cached_tokens = sum(result["metrics"].get("cached_prompt_tokens", 0) for result in results)
+        completion_tokens = sum(result["metrics"].get("completion_tokens", 0) for result in results)
+        print(f"Prompt tokens: {prompt_tokens} ({cached_tokens} cached, {prompt_tokens - cached_tokens} uncached, "
+              f"{cached_tokens / max(1, prompt_tokens):.1%} cache ratio); completion tokens: {completion_tokens}")
+    if scheduler is not None:
+        stats = scheduler.stats()
+        print(f"Scheduler: {stats['sent']} requests sent (+{stats['extra_requests']} re-asks and retries), "
+              f"{stats['rate_limited']} rate limited (429), "
+              f"{stats['queue_seconds'] / max(1, stats['sent']):.2f}s mean queue wait, "
+              f"~{stats['estimated_tokens']} tokens estimated vs {stats['actual_tokens']} reported")
+    if args.cascade:
+        print(cascade_stats.report())
+    if not args.no_cache:
+        stats = response_cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries ({stats['bytes']} bytes)")
+        stats = template_cache.stats()
+        print(f"Template cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate), "
+              f"{stats['stored']} templates stored, {stats['not_parameterizable']} schemas not parameterizable")
+
+if __name__ == "__main__":
+    main()
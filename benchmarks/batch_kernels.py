@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helper_functions import BATCH_KERNELS, HELPER_FUNCTIONS
+from expressions import to_plain
+
+# How to draw random arguments for each kernel: point, length or angle
+ARGUMENT_KINDS = {
+    "get_square_vertices": ["point", "length", "angle"],
+    "get_rectangle_vertices": ["point", "length", "length", "angle"],
+    "get_equilateral_triangle_vertices": ["point", "length", "angle"],
+    "get_isosceles_triangle_vertices": ["point", "length", "length", "angle"],
+    "get_right_triangle_vertices": ["point", "length", "length", "angle"],
+    "get_tangent_by_point": ["point", "length", "point"],
+    "get_tangent_by_distance_from_center": ["point", "length", "length"],
+    "get_tangent_by_length_of_tangent": ["point", "length", "length"],
+    "get_tangent_by_angle_between_tangents": ["point", "length", "angle"],
+    "get_tangent_by_angle_with_radius": ["point", "length", "angle"],
+    "get_chord_from_center_distance": ["point", "length", "length"],
+    "get_chord_from_length": ["point", "length", "length"],
+}
+
+def random_arguments(kind: str, n: int, rng: np.random.Generator) -> np.ndarray:
+    if kind == "point":
+        points = rng.uniform(-6, 6, size=(n, 3))
+        points[:, 2] = 0
+        return points
+    if kind == "length":
+        return rng.uniform(0.5, 6, size=n)
+    return rng.uniform(0.1, np.pi - 0.1, size=n)
+
+def check_kernel(name: str, n: int, rng: np.random.Generator) -> Dict[str, Any]:
+    """Compare a batched kernel with its scalar helper on random inputs and time both."""
+    columns = [random_arguments(kind, n, rng) for kind in ARGUMENT_KINDS[name]]
+    scalar = HELPER_FUNCTIONS[name]
+
+    start = time.perf_counter()
+    scalar_results = []
+    for i in range(n):
+        try:
+            scalar_results.append(to_plain(scalar(*[column[i].tolist() for column in columns])))
+        except ValueError:
+            scalar_results.append(None)
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_results = BATCH_KERNELS[name](*columns)
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = 0
+    for expected, row in zip(scalar_results, batch_results):
+        if expected is None:
+            mismatches += not np.isnan(row).all()
+        elif np.isnan(row).any() or not np.allclose(np.array(expected, dtype=float), row, atol=1e-9):
+            mismatches += 1
+
+    return {
+        "calls": n,
+        "mismatches": mismatches,
+        "scalar_seconds": scalar_seconds,
+        "batch_seconds": batch_seconds,
+        "speedup": scalar_seconds / batch_seconds if batch_seconds else float("inf"),
+    }
+
+def main():
+    """Check every batched kernel against its scalar helper and report the speedup."""
+    parser = argparse.ArgumentParser(description="Check and time the batched geometry kernels.")
+    parser.add_argument("--calls", type=int, default=20000, help="random calls per kernel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = {}
+    failed: List[str] = []
+    for name in BATCH_KERNELS:
+        result = check_kernel(name, args.calls, rng)
+        results[name] = result
+        if result["mismatches"]:
+            failed.append(name)
+        print(f"{name:<40} mismatches {result['mismatches']:5d}   scalar {result['scalar_seconds']:7.3f}s   "
+              f"batch {result['batch_seconds']:7.4f}s   x{result['speedup']:.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        sys.exit(f"Batched kernels disagree with the scalar helpers: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
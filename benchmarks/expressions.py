@@ -0,0 +1,138 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Callable, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helper_functions import HELPER_FUNCTIONS
+from expressions import compile_expression, evaluate_expression
+
+EXPRESSION_STRING = re.compile(r'"([^"]*get_[a-z_]+\([^"]*)"')
+
+def legacy_parse_array_literal(array_str: str) -> List[float]:
+    """The array literal parser compute_position used before the AST evaluator."""
+    try:
+        clean_str = array_str.strip()
+        if not (clean_str.startswith('[') and clean_str.endswith(']')):
+            return None
+        array_str = clean_str[1:-1]
+        if not array_str.strip():
+            return []
+        return [float(x.strip()) for x in array_str.split(',')]
+    except:
+        return None
+
+def legacy_evaluate_function_call(value: str) -> Any:
+    """The char-loop function call parser compute_position used before the AST evaluator."""
+    try:
+        indices = []
+        base_call = value
+        while base_call.endswith(']'):
+            idx_start = base_call.rindex('[')
+            idx = int(base_call[idx_start + 1:-1])
+            indices.insert(0, idx)
+            base_call = base_call[:idx_start]
+
+        func_name = base_call[:base_call.find("(")]
+        params_str = base_call[base_call.find("(")+1:base_call.rfind(")")]
+
+        params = []
+        current_param = ""
+        bracket_count = 0
+        for char in params_str:
+            if char == ',' and bracket_count == 0:
+                if current_param.strip():
+                    params.append(current_param.strip())
+                current_param = ""
+            else:
+                if char == '[':
+                    bracket_count += 1
+                elif char == ']':
+                    bracket_count -= 1
+                current_param += char
+        if current_param.strip():
+            params.append(current_param.strip())
+
+        converted_params = []
+        for param in params:
+            param = param.strip()
+            if param.startswith("[") and param.endswith("]"):
+                array_result = legacy_parse_array_literal(param)
+                converted_params.append(array_result if array_result is not None else [])
+            else:
+                try:
+                    converted_params.append(float(param))
+                except ValueError:
+                    converted_params.append(param)
+
+        result = HELPER_FUNCTIONS[func_name](*converted_params)
+        if isinstance(result, np.ndarray):
+            result = result.tolist()
+        elif isinstance(result, tuple):
+            result = [r.tolist() if isinstance(r, np.ndarray) else r for r in result]
+        for idx in indices:
+            result = result[idx]
+            if isinstance(result, np.ndarray):
+                result = result.tolist()
+        return result
+    except Exception:
+        return None
+
+def load_corpus() -> List[str]:
+    """Every helper call expression used in the few-shot examples."""
+    expressions = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "few_shot_examples", "*.txt"))):
+        with open(path, 'r') as f:
+            expressions.extend(EXPRESSION_STRING.findall(f.read()))
+    return expressions
+
+def throughput(func: Callable[[str], Any], expressions: List[str], seconds: float) -> float:
+    """Expressions evaluated per second, looping over the corpus for roughly `seconds`."""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for expression in expressions:
+            func(expression)
+        count += len(expressions)
+    return count / (time.perf_counter() - start)
+
+def cold_evaluate(expression: str) -> Any:
+    compile_expression.cache_clear()
+    return evaluate_expression(expression)
+
+def main():
+    """Compare the AST evaluator against the legacy char-loop parser."""
+    parser = argparse.ArgumentParser(description="Measure position expression throughput.")
+    parser.add_argument("--seconds", type=float, default=2.0, help="time budget per variant")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    expressions = load_corpus()
+    legacy_failures = sum(1 for e in expressions if legacy_evaluate_function_call(e) is None)
+    results = {
+        "expressions": len(expressions),
+        "legacy_failures": legacy_failures,
+        "legacy_per_second": throughput(legacy_evaluate_function_call, expressions, args.seconds),
+        "ast_cold_per_second": throughput(cold_evaluate, expressions, args.seconds),
+        "ast_cached_per_second": throughput(evaluate_expression, expressions, args.seconds),
+    }
+
+    print(f"Corpus: {results['expressions']} expressions from few_shot_examples/ "
+          f"({legacy_failures} unsupported by the legacy parser)")
+    for key in ("legacy_per_second", "ast_cold_per_second", "ast_cached_per_second"):
+        print(f"{key:<24} {results[key]:12.0f} expr/s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
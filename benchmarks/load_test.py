@@ -0,0 +1,170 @@
+import argparse
+import contextlib
+import copy
+import io
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from mock_server import add_server_arguments, load_recordings, server_from_arguments
+from batch import load_prompts
+from main import generate_json_schema
+from compute_position import evaluate_function_calls
+
+def classify_failure(error: Exception) -> str:
+    """Bucket a pipeline exception into a failure kind for the report."""
+    # generate_json_schema wraps errors in a ValueError; the original is its context
+    cause = error.__context__ or error
+    if isinstance(cause, requests.HTTPError) and cause.response is not None:
+        return "rate_limited" if cause.response.status_code == 429 else f"http_{cause.response.status_code}"
+    if isinstance(cause, requests.Timeout):
+        return "timeout"
+    if isinstance(cause, requests.ConnectionError):
+        return "connection_error"
+    message = str(cause)
+    if "No JSON output marker" in message:
+        return "missing_marker"
+    if "Schema validation failed" in message:
+        return "invalid_schema"
+    if "Invalid JSON" in message or "No valid JSON object" in message:
+        return "invalid_json"
+    return type(cause).__name__
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run_request(prompt: str, scheduled: float, model_name: str, stream: bool) -> Dict[str, Any]:
+    """Parse and evaluate one prompt; latency counts from the scheduled send time, so queueing shows up."""
+    try:
+        json_schema = generate_json_schema(prompt, model_name, verbose=False, use_cache=False, stream=stream,
+                                          use_fast_path=False)
+        evaluate_function_calls(copy.deepcopy(json_schema))
+        return {"ok": True, "seconds": time.perf_counter() - scheduled}
+    except Exception as e:
+        return {"ok": False, "failure": classify_failure(e), "seconds": time.perf_counter() - scheduled}
+
+def run_load(prompts: List[str], rate: float, duration: float, model_name: str, stream: bool,
+             max_in_flight: int, poisson: bool, seed: Optional[int]) -> Dict[str, Any]:
+    """Send requests open-loop at `rate` per second for `duration` seconds and summarize the outcomes.
+
+    Arrivals do not wait for earlier requests to finish; once `max_in_flight`
+    requests are running, new ones queue and their wait counts as latency.
+    """
+    rng = random.Random(seed)
+    results: List[Dict[str, Any]] = []
+    results_lock = threading.Lock()
+
+    def record(future):
+        with results_lock:
+            results.append(future.result())
+
+    start = time.perf_counter()
+    next_send = start
+    sent = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        while next_send - start < duration:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            future = pool.submit(run_request, prompts[sent % len(prompts)], next_send, model_name, stream)
+            future.add_done_callback(record)
+            sent += 1
+            next_send += rng.expovariate(rate) if poisson else 1 / rate
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(result["seconds"] for result in results if result["ok"])
+    succeeded = len(latencies)
+    return {
+        "sent": sent,
+        "succeeded": succeeded,
+        "failed": sent - succeeded,
+        "elapsed_seconds": elapsed,
+        "offered_rate": rate,
+        "throughput": succeeded / elapsed if elapsed else 0.0,
+        "latency_seconds": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "failures": dict(Counter(result["failure"] for result in results if not result["ok"])),
+    }
+
+def main():
+    """Drive parse + evaluate at a target request rate against a fault-injecting mock server."""
+    parser = argparse.ArgumentParser(description="Load test the parsing pipeline against a simulated LLM endpoint.")
+    parser.add_argument("--rate", type=float, default=5.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to keep sending")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed interval")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="requests running at once; the rest queue")
+    parser.add_argument("--model", default="llama-3.1-8b-instant")
+    parser.add_argument("--stream", action="store_true", help="stream completions")
+    parser.add_argument("--max-retries", type=int, help="client retries on 429/5xx (default: $LLM_MAX_RETRIES or 4)")
+    parser.add_argument("--prompts", help="JSONL prompts in the batch.py format (defaults to the few-shot questions)")
+    parser.add_argument("--base-url", help="drive this endpoint instead of starting the mock server")
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    # Retries above the connection pool size are expected here, not worth a warning each
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
+    if args.max_retries is not None:
+        os.environ["LLM_MAX_RETRIES"] = str(args.max_retries)
+    if args.prompts:
+        prompts = [item["prompt"] for item in load_prompts(args.prompts)]
+    else:
+        prompts = [recording["question"] for recording in load_recordings()]
+
+    mock = None
+    if args.base_url:
+        os.environ["LLM_BASE_URL"] = args.base_url
+    else:
+        mock = server_from_arguments(args).start()
+        os.environ["LLM_BASE_URL"] = mock.base_url
+
+    print(f"Sending {args.rate:g} requests/s for {args.duration:g}s to {os.environ['LLM_BASE_URL']}")
+    try:
+        # Parse errors are printed per request; the report below summarizes them
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = run_load(prompts, args.rate, args.duration, args.model, args.stream,
+                              args.max_in_flight, args.poisson, args.seed)
+    finally:
+        if mock is not None:
+            mock.stop()
+    if mock is not None:
+        report["server"] = {"requests": mock.requests, "injected_faults": dict(mock.faults)}
+
+    latency = report["latency_seconds"]
+    print(f"Sent {report['sent']}, succeeded {report['succeeded']}, failed {report['failed']} "
+          f"in {report['elapsed_seconds']:.1f}s")
+    print(f"Throughput {report['throughput']:.2f} successful requests/s (offered {args.rate:g}/s)")
+    if latency["p50"] is not None:
+        print(f"Latency p50 {latency['p50']:.3f}s   p95 {latency['p95']:.3f}s   p99 {latency['p99']:.3f}s   "
+              f"max {latency['max']:.3f}s")
+    print(f"Failures: {report['failures'] or 'none'}")
+    if "server" in report:
+        print(f"Server: {report['server']['requests']} requests (including retries), "
+              f"injected {report['server']['injected_faults'] or 'no faults'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from few_shot_index import estimate_tokens, split_sections
+
+JSON_MARKER = re.compile(r'^JSON( Output)?:\s*$', re.MULTILINE)
+HEADING = re.compile(r'^#{1,3}\s*(COMPLEX\s+)?EXAMPLE\s*\d*:?\s*', re.IGNORECASE)
+QUESTION_MARKER = "generate a JSON schema for:"
+INSTRUCTIONS_MARKER = "\nFirst provide your Chain of Thought"
+REASK_MARKER = "Your JSON schema has these problems:"
+
+def load_recordings(directory: str = os.path.join(ROOT, "few_shot_examples")) -> List[Dict[str, str]]:
+    """Question/completion pairs recorded from the worked examples in the few-shot files.
+
+    The completion is the example's reasoning followed by "JSON Output:" and
+    its JSON object, i.e. what a well-behaved model answers.
+    """
+    decoder = json.JSONDecoder()
+    recordings = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+        for section in split_sections(path):
+            if section.is_reference:
+                continue
+            text = section.text.strip()
+            marker = JSON_MARKER.search(text)
+            json_start = text.find('{', marker.end()) if marker else -1
+            if json_start == -1:
+                continue
+            try:
+                _, json_end = decoder.raw_decode(text, json_start)
+            except json.JSONDecodeError:
+                continue
+
+            heading, _, body = text[:marker.start()].partition("\n")
+            query = re.search(r'^Input query:(.*)$', body, re.MULTILINE)
+            if query:
+                question = query.group(1)
+                reasoning = body[:query.start()] + body[query.end():]
+            else:
+                # Questions without an "Input query:" line run on from the heading to the first blank line
+                continuation, _, reasoning = body.partition("\n\n")
+                question = f"{HEADING.sub('', heading)} {continuation}"
+            recordings.append({
+                "id": section.section_id,
+                "question": question.strip(),
+                "completion": f"{reasoning.strip()}\n\nJSON Output:\n{text[json_start:json_end]}",
+            })
+    return recordings
+
+def break_schema(completion: str) -> str:
+    """Give the first positioned entity in a completion's JSON an entity type nothing can draw."""
+    reasoning, _, json_text = completion.partition("JSON Output:")
+    json_schema = json.loads(json_text)
+    for entity in json_schema.get("entities", []):
+        if entity.get("id") in json_schema.get("positions", {}):
+            entity["type"] = "shape"
+            break
+    return f"{reasoning}JSON Output:\n{json.dumps(json_schema, indent=2)}"
+
+LATENCY_DISTRIBUTIONS = ("fixed", "exponential", "lognormal")
+
+class MockLLMServer:
+    """OpenAI-compatible chat completions server answering with recorded completions.
+
+    A request whose question matches a recording gets that completion, any
+    other question gets a recording picked by a hash of the question. Responses
+    wait a sampled latency before the first token (`latency` is the mean for
+    "exponential" and the median for "lognormal") and then arrive at
+    `chars_per_second`, streamed as chunked SSE when the request asks for it.
+
+    Faults are injected per request with the given rates: HTTP 500s, 429s
+    with Retry-After, completions cut off as if max_tokens was hit, and
+    completions without the "JSON Output:" marker, and schemas where an
+    entity has an unknown type (caught by the schema validator). `faults`
+    counts them. Re-asks (a follow-up listing schema problems) are answered
+    with the recorded JSON alone, as a model fixing its output would.
+
+    With requests_per_minute/tokens_per_minute the server also enforces rate
+    limits like Groq: every response carries x-ratelimit-* headers and
+    requests over the limit get a 429 (counted as "over_limit").
+    """
+
+    def __init__(self, recordings: Optional[List[Dict[str, str]]] = None, port: int = 0,
+                 latency: float = 0.05, chars_per_second: float = 4000.0, chunk_chars: int = 16,
+                 latency_distribution: str = "fixed", latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, truncation_rate: float = 0.0,
+                 missing_marker_rate: float = 0.0, invalid_schema_rate: float = 0.0,
+                 retry_after: float = 1.0, seed: Optional[int] = None,
+                 requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_distribution must be one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.recordings = recordings if recordings is not None else load_recordings()
+        self.by_question = {recording["question"]: recording for recording in self.recordings}
+        self.latency = latency
+        self.chars_per_second = chars_per_second
+        self.chunk_chars = chunk_chars
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        # Cumulative thresholds for picking at most one fault per request
+        self.fault_thresholds = []
+        total = 0.0
+        for fault, rate in (("server_error", error_rate), ("rate_limited", rate_limit_rate),
+                            ("truncated", truncation_rate), ("missing_marker", missing_marker_rate),
+                            ("invalid_schema", invalid_schema_rate)):
+            total += rate
+            self.fault_thresholds.append((total, fault))
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        # Remaining budget per limited kind ("requests"/"tokens"): [limit per minute, level]
+        self.limits = {kind: [float(limit), float(limit)]
+                       for kind, limit in (("requests", requests_per_minute), ("tokens", tokens_per_minute)) if limit}
+        self.limits_updated = time.monotonic()
+        self.requests = 0
+        self.faults: Counter = Counter()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    def sample(self):
+        """Latency and fault (or None) for the next request."""
+        with self.lock:
+            self.requests += 1
+            if self.latency_distribution == "exponential":
+                latency = self.random.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+            elif self.latency_distribution == "lognormal":
+                latency = self.latency * self.random.lognormvariate(0, self.latency_sigma)
+            else:
+                latency = self.latency
+            draw = self.random.random()
+            fault = next((fault for threshold, fault in self.fault_thresholds if draw < threshold), None)
+            if fault is not None:
+                self.faults[fault] += 1
+            cut = self.random.uniform(0.3, 0.9)
+        return latency, fault, cut
+
+    def admit(self, tokens: int):
+        """Charge a request against the rate limits. Returns (allowed, rate limit headers)."""
+        with self.lock:
+            now = time.monotonic()
+            for budget in self.limits.values():
+                budget[1] = min(budget[0], budget[1] + (now - self.limits_updated) * budget[0] / 60)
+            self.limits_updated = now
+            cost = {"requests": 1, "tokens": tokens}
+            allowed = all(budget[1] >= cost[kind] for kind, budget in self.limits.items())
+            if allowed:
+                for kind, budget in self.limits.items():
+                    budget[1] -= cost[kind]
+            else:
+                self.faults["over_limit"] += 1
+            headers = {}
+            for kind, (limit, level) in self.limits.items():
+                headers[f"x-ratelimit-limit-{kind}"] = str(int(limit))
+                headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, int(level)))
+                headers[f"x-ratelimit-reset-{kind}"] = f"{(limit - level) * 60 / limit:.2f}s"
+            if not allowed:
+                missing = max((cost[kind] - budget[1]) * 60 / budget[0] for kind, budget in self.limits.items())
+                headers["Retry-After"] = f"{max(missing, 0.0):.2f}"
+        return allowed, headers
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def recording_for(self, payload: Dict[str, Any]) -> Dict[str, str]:
+        """The recording answering the question in the last message that asks one."""
+        content = next((message["content"] for message in reversed(payload["messages"])
+                        if QUESTION_MARKER in message["content"]), payload["messages"][-1]["content"])
+        question = content.split(QUESTION_MARKER, 1)[-1].split(INSTRUCTIONS_MARKER, 1)[0].strip()
+        if question in self.by_question:
+            return self.by_question[question]
+        digest = hashlib.sha256(question.encode('utf-8')).digest()
+        return self.recordings[int.from_bytes(digest[:4], "big") % len(self.recordings)]
+
+    def completion_for(self, payload: Dict[str, Any]) -> str:
+        completion = self.recording_for(payload)["completion"]
+        if payload["messages"][-1]["content"].startswith(REASK_MARKER):
+            return "JSON Output:\n" + completion.split("JSON Output:", 1)[1].strip()
+        return completion
+
+    def usage(self, payload: Dict[str, Any], completion: str) -> Dict[str, int]:
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in payload["messages"])
+        completion_tokens = estimate_tokens(completion)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _make_handler(self):
+        mock = self
+
+        class MockHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Clients drop keep-alive connections, e.g. after closing a stream early
+                    pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                completion = mock.completion_for(payload)
+                rate_limit_headers = {}
+                if mock.limits:
+                    usage = mock.usage(payload, completion)
+                    allowed, rate_limit_headers = mock.admit(usage["total_tokens"])
+                    if not allowed:
+                        self._send_json({"error": {"message": "rate limit exceeded"}}, 429, rate_limit_headers)
+                        return
+                latency, fault, cut = mock.sample()
+                time.sleep(latency)
+
+                if fault == "server_error":
+                    self._send_json({"error": {"message": "injected server error"}}, 500)
+                    return
+                if fault == "rate_limited":
+                    self._send_json({"error": {"message": "injected rate limit"}}, 429,
+                                    {"Retry-After": str(mock.retry_after)})
+                    return
+                finish_reason = "stop"
+                if fault == "truncated":
+                    completion = completion[:int(len(completion) * cut)]
+                    finish_reason = "length"
+                elif fault == "missing_marker":
+                    completion = completion.replace("JSON Output:", "")
+                elif fault == "invalid_schema":
+                    completion = break_schema(completion)
+
+                if payload.get("stream"):
+                    self._stream(payload, completion, finish_reason, rate_limit_headers)
+                else:
+                    time.sleep(len(completion) / mock.chars_per_second)
+                    self._send_json({
+                        "id": "mock-completion",
+                        "object": "chat.completion",
+                        "model": payload.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": completion},
+                                     "finish_reason": finish_reason}],
+                        "usage": mock.usage(payload, completion),
+                    }, headers=rate_limit_headers)
+
+            def _send_json(self, body: Dict[str, Any], status: int = 200, headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, payload: Dict[str, Any], completion: str, finish_reason: str = "stop",
+                        headers: Optional[Dict[str, str]] = None):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                delay = mock.chunk_chars / mock.chars_per_second
+                try:
+                    for start in range(0, len(completion), mock.chunk_chars):
+                        delta = completion[start:start + mock.chunk_chars]
+                        event = {"object": "chat.completion.chunk", "model": payload.get("model"),
+                                 "choices": [{"index": 0, "delta": {"content": delta}}]}
+                        self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                        time.sleep(delay)
+                    event = {"object": "chat.completion.chunk", "model": payload.get("model"),
+                             "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
+                    self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream early, e.g. once the JSON object was complete
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return MockHandler
+
+    def start(self) -> "MockLLMServer":
+        """Serve on a background thread."""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Latency and fault injection options shared by the mock server and the load test."""
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="fixed, exponential (mean --latency) or lognormal (median --latency)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape parameter")
+    parser.add_argument("--chars-per-second", type=float, default=4000.0, help="completion generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--truncation-rate", type=float, default=0.0, help="fraction of completions cut off (max_tokens)")
+    parser.add_argument("--missing-marker-rate", type=float, default=0.0, help='fraction without the "JSON Output:" marker')
+    parser.add_argument("--invalid-schema-rate", type=float, default=0.0,
+                        help="fraction of schemas given an entity type the validator rejects")
+    parser.add_argument("--seed", type=int, help="seed for latency and fault sampling")
+    parser.add_argument("--server-rpm", type=float, help="enforce a requests per minute limit with x-ratelimit headers")
+    parser.add_argument("--server-tpm", type=float, help="enforce a tokens per minute limit with x-ratelimit headers")
+
+def server_from_arguments(args: argparse.Namespace, port: int = 0) -> MockLLMServer:
+    """A mock server configured from add_server_arguments() options."""
+    return MockLLMServer(
+        port=port, latency=args.latency, chars_per_second=args.chars_per_second,
+        latency_distribution=args.latency_distribution, latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, truncation_rate=args.truncation_rate,
+        missing_marker_rate=args.missing_marker_rate, invalid_schema_rate=args.invalid_schema_rate,
+        retry_after=args.retry_after, seed=args.seed,
+        requests_per_minute=args.server_rpm, tokens_per_minute=args.server_tpm
+    )
+
+def main():
+    """Run the mock server in the foreground."""
+    parser = argparse.ArgumentParser(description="Serve recorded completions from an OpenAI-compatible endpoint.")
+    parser.add_argument("--port", type=int, default=8766)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    mock = server_from_arguments(args, args.port)
+    print(f"Serving {len(mock.recordings)} recorded completions at {mock.base_url} "
+          f"(LLM_BASE_URL={mock.base_url})")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+        print(f"Served {mock.requests} requests, injected faults: {dict(mock.faults) or 'none'}")
+
+if __name__ == "__main__":
+    main()
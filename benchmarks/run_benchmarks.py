@@ -0,0 +1,170 @@
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from mock_server import MockLLMServer, load_recordings
+from batch import load_prompts
+from main import build_messages, extract_json_schema, generate_json_schema, get_few_shot_examples
+from compute_position import evaluate_function_calls, fit_to_frame
+from fast_path import parse_prompt
+import generate_code
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+def time_stage(func: Callable[[Any], Any], items: List[Any], repeats: int = 1) -> Dict[str, Any]:
+    """Call func on every item `repeats` times (stdout silenced) and summarize the per-call times."""
+    seconds = []
+    errors = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            for item in items:
+                start = time.perf_counter()
+                try:
+                    func(item)
+                except Exception:
+                    errors += 1
+                seconds.append(time.perf_counter() - start)
+    seconds.sort()
+    return {
+        "calls": len(seconds),
+        "errors": errors,
+        "total_seconds": sum(seconds),
+        "mean_ms": statistics.fmean(seconds) * 1000,
+        "p50_ms": seconds[len(seconds) // 2] * 1000,
+        "p95_ms": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] * 1000,
+        "max_ms": seconds[-1] * 1000,
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(prompts: List[str], repeats: int, latency: float, chars_per_second: float,
+                   render: bool, work_dir: str) -> Dict[str, Any]:
+    """Time every pipeline stage offline, with the LLM replaced by the mock server."""
+    recordings = load_recordings()
+    schemas = [extract_json_schema(recording["completion"], verbose=False) for recording in recordings]
+    with contextlib.redirect_stdout(io.StringIO()):
+        final_schemas = [evaluate_function_calls(copy.deepcopy(schema)) for schema in schemas]
+    scene_paths = []
+    for index, final_schema in enumerate(final_schemas):
+        scene_paths.append(os.path.join(work_dir, f"scene_{index:03d}_final.json"))
+        with open(scene_paths[-1], 'w') as f:
+            json.dump(final_schema, f)
+
+    stages = {}
+    stages["prompt_assembly"] = time_stage(
+        lambda prompt: build_messages(prompt, get_few_shot_examples(prompt)), prompts, repeats)
+    stages["fast_path"] = time_stage(parse_prompt, prompts, repeats)
+    stages["json_extraction"] = time_stage(
+        lambda recording: extract_json_schema(recording["completion"], verbose=False), recordings, repeats)
+    stages["evaluate_function_calls"] = time_stage(
+        lambda schema: evaluate_function_calls(copy.deepcopy(schema)), schemas, repeats)
+    with contextlib.redirect_stdout(io.StringIO()):
+        unfitted_schemas = [evaluate_function_calls(copy.deepcopy(schema), fit=False) for schema in schemas]
+    stages["fit_to_frame"] = time_stage(lambda scene: fit_to_frame(copy.deepcopy(scene)), unfitted_schemas, repeats)
+    stages["generate_code"] = time_stage(
+        lambda path: generate_code.main(path, path[:-len("_final.json")] + ".py"), scene_paths, repeats)
+
+    mock = MockLLMServer(recordings, latency=latency, chars_per_second=chars_per_second).start()
+    os.environ["LLM_BASE_URL"] = mock.base_url
+    try:
+        stages["llm_request"] = time_stage(
+            lambda prompt: generate_json_schema(prompt, verbose=False, use_cache=False, use_fast_path=False), prompts)
+        stages["llm_stream"] = time_stage(
+            lambda prompt: generate_json_schema(prompt, verbose=False, use_cache=False, stream=True,
+                                                use_fast_path=False), prompts)
+    finally:
+        mock.stop()
+
+    if render:
+        try:
+            from scene_renderer import render_scene
+        except ImportError as e:
+            stages["render"] = {"skipped": f"renderer unavailable: {e}"}
+        else:
+            names = iter(range(len(final_schemas) * repeats))
+            media_dir = os.path.join(work_dir, "media")
+            stages["render"] = time_stage(
+                lambda scene: render_scene(scene, media_dir, output_name=f"bench_{next(names)}", use_cache=False),
+                final_schemas)
+    return stages
+
+def compare(results: Dict[str, Any], baseline_path: str):
+    """Print the change in mean time per stage against an earlier results file."""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline.get('git_commit') or 'unknown commit'}):")
+    for stage, result in results["stages"].items():
+        before = baseline.get("stages", {}).get(stage, {})
+        if "mean_ms" in result and "mean_ms" in before and before["mean_ms"]:
+            change = (result["mean_ms"] - before["mean_ms"]) / before["mean_ms"]
+            print(f"{stage:<24} {before['mean_ms']:9.3f} ms -> {result['mean_ms']:9.3f} ms   {change:+.1%}")
+
+def main():
+    """Run the offline benchmark suite and write the results as JSON."""
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage offline against a mock LLM server.")
+    parser.add_argument("--prompts", help="JSONL prompts in the batch.py format (defaults to the few-shot questions)")
+    parser.add_argument("--repeats", type=int, default=5, help="passes over the inputs for the in-process stages")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server seconds before the first token")
+    parser.add_argument("--chars-per-second", type=float, default=4000.0, help="mock server generation speed")
+    parser.add_argument("--no-render", action="store_true", help="skip the render stage")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.prompts:
+        prompts = [item["prompt"] for item in load_prompts(args.prompts)]
+    else:
+        prompts = [recording["question"] for recording in load_recordings()]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        stages = run_benchmarks(prompts, args.repeats, args.latency, args.chars_per_second,
+                                not args.no_render, work_dir)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"prompts": len(prompts), "repeats": args.repeats, "latency": args.latency,
+                     "chars_per_second": args.chars_per_second},
+        "stages": stages,
+    }
+
+    for stage, result in stages.items():
+        if "skipped" in result:
+            print(f"{stage:<24} skipped ({result['skipped']})")
+        else:
+            print(f"{stage:<24} {result['calls']:5d} calls   mean {result['mean_ms']:9.3f} ms   "
+                  f"p95 {result['p95_ms']:9.3f} ms   errors {result['errors']}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
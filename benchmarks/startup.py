@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module each pipeline stage has to import before it can do any work
+STAGE_MODULES = [
+    ("parse", "main"),
+    ("evaluate", "compute_position"),
+    ("codegen", "generate_code"),
+    ("pipeline", "pipeline"),
+    ("render", "manim"),
+]
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+def time_import(module: str, repeats: int) -> Dict[str, Any]:
+    """Import a module in fresh interpreters and return import and total process times."""
+    import_times: List[float] = []
+    process_times: List[float] = []
+    env = {**os.environ, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "benchmark")}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        process_seconds = time.perf_counter() - start
+        if completed.returncode != 0:
+            return {"module": module, "error": completed.stderr.strip().splitlines()[-1]}
+        import_times.append(float(completed.stdout.strip().splitlines()[-1]))
+        process_times.append(process_seconds)
+    return {
+        "module": module,
+        "import_seconds": statistics.median(import_times),
+        "process_seconds": statistics.median(process_times),
+    }
+
+def main():
+    """Report the median import and interpreter start-up cost of each pipeline stage."""
+    parser = argparse.ArgumentParser(description="Measure per-stage import time in fresh interpreters.")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per stage")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for stage, module in STAGE_MODULES:
+        result = time_import(module, args.repeats)
+        results[stage] = result
+        if "error" in result:
+            print(f"{stage:<10} {module:<18} failed: {result['error']}")
+        else:
+            print(f"{stage:<10} {module:<18} import {result['import_seconds'] * 1000:8.1f} ms   "
+                  f"process {result['process_seconds'] * 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Any, Optional
+
+# Eviction triggered by a put trims to this fraction of the caps, so a full cache is not rescanned on every write
+EVICT_TO = 0.9
+
+def make_cache_key(*parts: Any) -> str:
+    """Hash JSON-serializable parts into a stable hex cache key."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class DiskCache:
+    """Persistent JSON cache with one file per key and LRU eviction.
+
+    File modification times double as the access clock, so recency survives
+    restarts and is shared between processes using the same directory. The
+    entry count and size are scanned once and then tracked per put, so the
+    directory is only listed again when a cap is exceeded (entries written by
+    other processes are picked up at that point).
+    """
+
+    def __init__(self, directory: str = ".scene_cache", max_entries: int = 5000, max_bytes: int = 200 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Entry count and total bytes on disk, or None until the directory is first scanned
+        self._entries: Optional[int] = None
+        self._bytes = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _scan(self) -> list:
+        """(mtime, size, path) for every entry, oldest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+            # Touch the entry so it becomes the most recently used
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value under key and evict least recently used entries once a cap is exceeded."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(value, f)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            if self._entries is None:
+                entries = self._scan()
+                self._entries = len(entries)
+                self._bytes = sum(entry_size for _, entry_size, _ in entries)
+            try:
+                # Overwriting an entry replaces its size rather than adding one
+                self._bytes -= os.path.getsize(path)
+                self._entries -= 1
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._entries += 1
+            self._bytes += size
+            over = self._entries > self.max_entries or self._bytes > self.max_bytes
+        if over:
+            self.evict(EVICT_TO)
+
+    def evict(self, fraction: float = 1.0) -> int:
+        """Remove least recently used entries until both caps (scaled by fraction) are met. Returns the number removed."""
+        entries = self._scan()
+        total_bytes = sum(size for _, size, _ in entries)
+        max_entries = int(self.max_entries * fraction)
+        max_bytes = self.max_bytes * fraction
+        removed = 0
+        while entries and (len(entries) > max_entries or total_bytes > max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            removed += 1
+        with self._lock:
+            self._entries = len(entries)
+            self._bytes = total_bytes
+        return removed
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+        with self._lock:
+            self._entries = 0
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current on-disk footprint."""
+        entries = 0
+        total_bytes = 0
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    entries += 1
+                    total_bytes += os.path.getsize(os.path.join(self.directory, name))
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+class RenderCache:
+    """Rendered images on disk, one file per key, with LRU eviction by total size.
+
+    Each image has a small JSON sidecar recording how long the original render
+    took, so hits can report the render time they saved. Like DiskCache, the
+    total size is scanned once and then tracked per put, and the directory is
+    only listed again when the cap is exceeded.
+    """
+
+    def __init__(self, directory: str = ".render_cache", max_bytes: int = 500 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+        # Total image bytes on disk, or None until the directory is first scanned
+        self._bytes: Optional[int] = None
+
+    def _path(self, key: str, extension: str = ".png") -> str:
+        return os.path.join(self.directory, f"{key}{extension}")
+
+    def _scan(self) -> list:
+        """(mtime, size, path) for every image, oldest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.png'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the path of the cached image for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(self._path(key, ".json"), 'r') as f:
+                seconds = json.load(f).get("seconds", 0.0)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.seconds_saved += seconds
+        return path
+
+    def put(self, key: str, image_path: str, seconds: float) -> str:
+        """Copy a freshly rendered image into the cache and return its cached path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(image_path, path + suffix)
+        size = os.path.getsize(path + suffix)
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(entry_size for _, entry_size, _ in self._scan())
+            try:
+                # Overwriting an image replaces its size rather than adding to it
+                self._bytes -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(path + suffix, path)
+            self._bytes += size
+            over = self._bytes > self.max_bytes
+        # The sidecar is written last, so a readable sidecar always means a complete image
+        with open(self._path(key, ".json") + suffix, 'w') as f:
+            json.dump({"seconds": seconds}, f)
+        os.replace(self._path(key, ".json") + suffix, self._path(key, ".json"))
+        if over:
+            self.evict(EVICT_TO)
+        return path
+
+    def evict(self, fraction: float = 1.0) -> int:
+        """Remove least recently used images until the size cap (scaled by fraction) is met. Returns the number removed."""
+        entries = self._scan()
+        total_bytes = sum(size for _, size, _ in entries)
+        max_bytes = self.max_bytes * fraction
+        removed = 0
+        while entries and total_bytes > max_bytes:
+            _, size, path = entries.pop(0)
+            for stale in (path[:-len('.png')] + '.json', path):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total_bytes
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters, render seconds saved and the current on-disk footprint."""
+        entries = 0
+        total_bytes = 0
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.png'):
+                    entries += 1
+                    total_bytes += os.path.getsize(os.path.join(self.directory, name))
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
@@ -0,0 +1,126 @@
+import copy
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from main import generate_json_schema
+from compute_position import evaluate_function_calls
+from expressions import entity_references, evaluate_expression
+from generate_code import ENTITY_POSITION_FIELDS
+from schema_validator import validate_schema
+
+# Cheapest/fastest model first; later tiers only see requests the earlier ones got wrong
+DEFAULT_TIERS = [model for model in os.getenv("CASCADE_MODELS", "llama-3.1-8b-instant,qwen-qwq-32b").split(",") if model]
+
+def _non_numeric(value: Any) -> List[Any]:
+    """Leaves of an evaluated position field that are not numbers (unevaluated expressions, nulls, ...)."""
+    if isinstance(value, (list, tuple)):
+        return [leaf for item in value for leaf in _non_numeric(item)]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return []
+    return [value]
+
+def _expression_error(expression: Any) -> str:
+    """Why a position value did not evaluate to a number."""
+    if not isinstance(expression, str):
+        return f"{expression!r} is not a number"
+    try:
+        result = evaluate_expression(expression)
+    except Exception as e:
+        return f"{expression!r}: {e}"
+    return f"{expression!r} evaluates to {result!r}, not a number"
+
+def validate_scene(json_schema: Dict[str, Any]) -> List[str]:
+    """Problems that would stop a schema from being evaluated and drawn; empty when it is usable.
+
+    On top of the structural checks in schema_validator (which
+    generate_json_schema already applies), the position fields generate_code
+    reads must all evaluate to numbers.
+    """
+    problems = validate_schema(json_schema)
+    if problems:
+        return problems
+
+    entities = {entity["id"]: entity for entity in json_schema["entities"]}
+    final_schema = evaluate_function_calls(copy.deepcopy(json_schema))
+    positions = final_schema["positions"]
+    # Re-evaluate failures with the evaluated entries in scope to get the error message
+    with entity_references(positions):
+        for entity_id, position in positions.items():
+            for field in ENTITY_POSITION_FIELDS[entities[entity_id]["type"]]:
+                for leaf in _non_numeric(position[field]):
+                    problems.append(f"positions.{entity_id}.{field}: {_expression_error(leaf)}")
+    return problems
+
+class CascadeStats:
+    """Per-tier attempts, validated successes and latency, shared by every cascade call in the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tiers: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        self.failed = 0
+
+    def record(self, model_name: str, ok: bool, seconds: float):
+        with self.lock:
+            tier = self.tiers.setdefault(model_name, {"attempts": 0, "successes": 0, "seconds": 0.0})
+            tier["attempts"] += 1
+            tier["successes"] += ok
+            tier["seconds"] += seconds
+
+    def finish(self, ok: bool):
+        with self.lock:
+            self.requests += 1
+            self.failed += not ok
+
+    def report(self) -> str:
+        with self.lock:
+            lines = [f"Cascade: {self.requests} requests, {self.failed} failed on every tier"]
+            for model_name, tier in self.tiers.items():
+                lines.append(
+                    f"  {model_name:<28} {tier['attempts']:5d} attempts   "
+                    f"{tier['successes'] / max(1, tier['attempts']):6.1%} valid   "
+                    f"{tier['successes'] / max(1, self.requests):6.1%} of requests   "
+                    f"mean {tier['seconds'] / max(1, tier['attempts']):.2f}s"
+                )
+        return "\n".join(lines)
+
+cascade_stats = CascadeStats()
+
+def generate_with_cascade(description: str, tiers: Optional[List[str]] = None, verbose: bool = True,
+                          use_cache: bool = True, stream: bool = False,
+                          metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Try each model tier in order and return the first schema that passes validate_scene().
+
+    Generation errors count as validation failures. `metrics` receives the
+    model that answered ("tier") and the problems found at each earlier tier.
+    Raises ValueError if no tier produces a usable schema.
+    """
+    tiers = tiers or DEFAULT_TIERS
+    failures = {}
+    for model_name in tiers:
+        start = time.perf_counter()
+        tier_metrics = {}
+        try:
+            json_schema = generate_json_schema(description, model_name, verbose=verbose, use_cache=use_cache,
+                                               stream=stream, metrics=tier_metrics)
+            problems = validate_scene(json_schema)
+        except ValueError as e:
+            problems = [str(e)]
+        cascade_stats.record(model_name, not problems, time.perf_counter() - start)
+
+        if not problems:
+            cascade_stats.finish(True)
+            if metrics is not None:
+                metrics.update(tier_metrics)
+                metrics.update({"tier": model_name, "tier_failures": failures})
+            return json_schema
+        failures[model_name] = problems
+        if verbose:
+            print(f"{model_name} schema rejected, escalating: {'; '.join(problems)}")
+
+    cascade_stats.finish(False)
+    if metrics is not None:
+        metrics["tier_failures"] = failures
+    raise ValueError(f"No model tier produced a usable schema: {failures}")
@@ -1,175 +1,308 @@
+import inspect
 import json
+import os
+import sys
 import numpy as np
-from typing import Dict, Any, List
-from helper_functions import *
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from graphlib import CycleError, TopologicalSorter
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from helper_functions import BATCH_KERNELS
+from tracing import span
+from expressions import (
+    CallMemo, ExpressionError, call_key, call_memo, compile_expression, current_call_memo,
+    entity_references, evaluate_expression, find_literal_calls, find_references
+)
 
-def parse_array_literal(array_str: str) -> List[float]:
-    """Parse an array literal string into a list of floats."""
+# The part of manim's frame scenes are fitted into, leaving room for labels
+FRAME_SIZE = np.array([12.0, 7.0])
+
+# Evaluated position fields holding a point or a list of points
+POINT_FIELDS = ("center", "coordinates", "endpoints", "vertices")
+
+# Entity and relationship fields holding lengths, scaled with the scene unless units are kept
+LENGTH_KEYS = ("radius", "length", "side", "side_length", "base", "height", "width", "distance")
+
+# False while probing whether a scene can be constructed, where failures are expected
+_report_errors: ContextVar[bool] = ContextVar("report_errors", default=True)
+
+@contextmanager
+def quiet_evaluation() -> Iterator[None]:
+    """Do not print evaluation errors inside this block (the failed values are still left unevaluated)."""
+    token = _report_errors.set(False)
     try:
-        # Remove any whitespace and ensure it's a valid array literal
-        clean_str = array_str.strip()
-        if not (clean_str.startswith('[') and clean_str.endswith(']')):
-            return None
-        
-        # Parse the array string
-        array_str = clean_str[1:-1]  # Remove brackets
-        if not array_str.strip():
-            return []
-        
-        # Split by comma and convert to floats
-        values = [float(x.strip()) for x in array_str.split(',')]
-        return values
-    except:
-        return None
+        yield
+    finally:
+        _report_errors.reset(token)
 
 def evaluate_function_call(value: str) -> Any:
     """Evaluate a function call string with array indexing."""
     try:
-        # Handle array indexing
-        indices = []
-        base_call = value
-        while base_call.endswith(']'):
-            idx_start = base_call.rindex('[')
-            idx = int(base_call[idx_start + 1:-1])
-            indices.insert(0, idx)
-            base_call = base_call[:idx_start]
-
-        # Extract function name and parameters
-        func_name = base_call[:base_call.find("(")]
-        params_str = base_call[base_call.find("(")+1:base_call.rfind(")")]
-        
-        # Parse parameters
-        params = []
-        current_param = ""
-        bracket_count = 0
-        
-        for char in params_str:
-            if char == ',' and bracket_count == 0:
-                if current_param.strip():
-                    params.append(current_param.strip())
-                current_param = ""
-            else:
-                if char == '[':
-                    bracket_count += 1
-                elif char == ']':
-                    bracket_count -= 1
-                current_param += char
-        
-        if current_param.strip():
-            params.append(current_param.strip())
-        
-        # Convert parameters to appropriate types
-        converted_params = []
-        for param in params:
-            param = param.strip()
-            if param.startswith("[") and param.endswith("]"):
-                # Parse array parameter
-                array_result = parse_array_literal(param)
-                if array_result is not None:
-                    converted_params.append(array_result)
-                else:
-                    converted_params.append([])
-            elif param.startswith("'") or param.startswith('"'):
-                # Parse string parameter
-                param_value = param.strip("'\"")
-                # Map 'upper' to 'right' and 'lower' to 'left' for get_single_tangent_point
-                if func_name == "get_single_tangent_point":
-                    side_map = {'upper': 'right', 'lower': 'left'}
-                    param_value = side_map.get(param_value, param_value)
-                converted_params.append(param_value)
-            elif param.lower() == "true":
-                converted_params.append(True)
-            elif param.lower() == "false":
-                converted_params.append(False)
-            elif param.lower() == "null" or param.lower() == "none":
-                converted_params.append(None)
-            else:
-                try:
-                    # Try to convert to float first
-                    converted_params.append(float(param))
-                except ValueError:
-                    # If that fails, keep as string
-                    converted_params.append(param)
-        
-        # Call the appropriate function
-        func = globals()[func_name]
-        result = func(*converted_params)
-        
-        # Convert result to list if it's numpy array
-        if isinstance(result, np.ndarray):
-            result = result.tolist()
-        elif isinstance(result, tuple):
-            result = [r.tolist() if isinstance(r, np.ndarray) else r for r in result]
-        
-        # Apply array indexing
-        for idx in indices:
-            result = result[idx]
-            if isinstance(result, np.ndarray):
-                result = result.tolist()
-        
-        return result
+        return evaluate_expression(value)
     except Exception as e:
-        print(f"Error evaluating function {value}: {str(e)}")
+        if _report_errors.get():
+            print(f"Error evaluating function {value}: {str(e)}")
         return None
 
 def evaluate_value(value: Any) -> Any:
-    """Evaluate a value that might be a function call or array literal."""
+    """Evaluate a value that might be a function call, arithmetic or array literal."""
     if not isinstance(value, str):
         return value
-        
-    # First try to parse as array literal
-    if value.strip().startswith('[') and value.strip().endswith(']'):
-        array_result = parse_array_literal(value)
-        if array_result is not None:
-            return array_result
-        
-    # Then try to evaluate as function call
-    if any(fname in value for fname in [
-        "get_square_vertices",
-        "get_rectangle_vertices",
-        "get_equilateral_triangle_vertices",
-        "get_right_triangle_vertices",
-        "get_isosceles_triangle_vertices",
-        "get_scalene_triangle_vertices",
-        "get_common_chord",
-        "get_chord_from_center_distance",
-        "get_chord_from_length",
-        "get_tangent_by_point",
-        "get_tangent_by_angle_between_tangents",
-        "get_tangent_by_angle_with_radius",
-        "get_tangent_by_distance_from_center",
-        "get_tangent_by_length_of_tangent",
-    ]):
-        result = evaluate_function_call(value)
-        if result is not None:
-            return result
+
+    try:
+        compile_expression(value)
+    except ExpressionError:
+        # Not an expression (e.g. a label), keep the string as it is
+        return value
+
+    result = evaluate_function_call(value)
+    if result is not None:
+        return result
         
     return value
 
-def evaluate_function_calls(json_schema: Dict[str, Any]) -> Dict[str, Any]:
-    """Evaluate function calls in the JSON schema."""
+def evaluate_position(position_data: Any) -> Any:
+    """Evaluate one entry of the positions section."""
+    if isinstance(position_data, dict):
+        # Handle dictionary case (original behavior)
+        evaluated_position = {}
+        for key, value in position_data.items():
+            if isinstance(value, list):
+                # Handle arrays of values
+                evaluated_position[key] = [evaluate_value(item) for item in value]
+            else:
+                # Handle single values
+                evaluated_position[key] = evaluate_value(value)
+        return evaluated_position
+    # Handle direct value case (string, list, etc.)
+    return evaluate_value(position_data)
+
+def evaluation_order(positions: Dict[str, Any]) -> List[str]:
+    """Order position entries so that entities referenced as ID.field are evaluated first."""
+    graph = {
+        entity_id: find_references(position_data) & positions.keys()
+        for entity_id, position_data in positions.items()
+    }
+    try:
+        return list(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        print(f"Error: circular position references {e.args[1]}, evaluating in document order")
+        return list(positions.keys())
+
+def evaluate_function_calls(json_schema: Dict[str, Any], stats: Optional[Dict[str, int]] = None,
+                            fit: bool = True, keep_units: bool = False) -> Dict[str, Any]:
+    """Evaluate function calls in the JSON schema.
+
+    Entries are evaluated in dependency order so they can refer to each other
+    (e.g. "C1.center" or "T1.endpoints[0]"), and each distinct helper call is
+    evaluated once per scene. If `stats` is given, it receives the number of
+    helper call sites and how many calls actually ran after deduplication.
+    Unless `fit` is False the evaluated scene is then scaled into the frame
+    with fit_to_frame(json_schema, keep_units).
+    """
     positions = json_schema.get("positions", {})
     evaluated_positions = {}
-    
-    for entity_id, position_data in positions.items():
-        if isinstance(position_data, dict):
-            # Handle dictionary case (original behavior)
-            evaluated_position = {}
-            for key, value in position_data.items():
-                if isinstance(value, list):
-                    # Handle arrays of values
-                    evaluated_position[key] = [evaluate_value(item) for item in value]
+
+    # Reuse an active memo (batch mode) or start a fresh one for this scene
+    with span("evaluate_positions", entities=len(positions)) as evaluate_span, \
+            call_memo(current_call_memo()) as memo, entity_references(evaluated_positions):
+        calls_before, evaluated_before = memo.calls, memo.evaluated
+        for entity_id in evaluation_order(positions):
+            evaluated_positions[entity_id] = evaluate_position(positions[entity_id])
+        evaluate_span.set(call_sites=memo.calls - calls_before, evaluated_calls=memo.evaluated - evaluated_before)
+
+    if stats is not None:
+        stats["call_sites"] = memo.calls - calls_before
+        stats["evaluated_calls"] = memo.evaluated - evaluated_before
+
+    # Keep the original entry order in the output
+    json_schema["positions"] = {entity_id: evaluated_positions[entity_id] for entity_id in positions}
+    if fit:
+        fit_to_frame(json_schema, keep_units)
+    return json_schema
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+
+def _xy_rows(value: Any) -> Optional[List[List[float]]]:
+    """An evaluated point or list of points as [x, y] rows; None if it is not numeric."""
+    if isinstance(value, (list, tuple)) and value and _is_number(value[0]):
+        value = [value]
+    if not isinstance(value, (list, tuple)) or not value:
+        return None
+    rows = []
+    for point in value:
+        if not isinstance(point, (list, tuple)) or len(point) < 2 or not (_is_number(point[0]) and _is_number(point[1])):
+            return None
+        rows.append([point[0], point[1]])
+    return rows
+
+def scene_points(positions: Dict[str, Any]) -> Tuple[np.ndarray, List[str]]:
+    """Every x, y an evaluated scene reaches, as one (n, 2) array, plus the ids whose geometry is not numeric.
+
+    Points, endpoints and vertices are taken as they are; circles and
+    semicircles contribute the corners of the box around the full circle.
+    Rows that are not finite (e.g. NaN from an impossible construction) are dropped.
+    """
+    rows, circles, unevaluated = [], [], []
+    for entity_id, position in positions.items():
+        if not isinstance(position, dict):
+            continue
+        ok = True
+        if "radius" in position:
+            center = _xy_rows(position.get("center") or [0, 0, 0])
+            ok = center is not None and _is_number(position["radius"])
+            if ok:
+                circles.append(center[0] + [abs(position["radius"])])
+        for field in POINT_FIELDS:
+            if field in position and (field != "center" or "radius" not in position):
+                points = _xy_rows(position[field])
+                if points is None:
+                    ok = False
                 else:
-                    # Handle single values
-                    evaluated_position[key] = evaluate_value(value)
-            evaluated_positions[entity_id] = evaluated_position
-        else:
-            # Handle direct value case (string, list, etc.)
-            evaluated_positions[entity_id] = evaluate_value(position_data)
-    
-    json_schema["positions"] = evaluated_positions
+                    rows += points
+        if not ok:
+            unevaluated.append(entity_id)
+    points = np.array(rows, dtype=float).reshape(-1, 2)
+    if circles:
+        circles = np.array(circles, dtype=float)
+        centers, radii = circles[:, :2], circles[:, 2:]
+        points = np.concatenate([points, centers - radii, centers + radii])
+    return points[np.isfinite(points).all(axis=1)], unevaluated
+
+def _transform(value: Any, scale: float, offset: List[float]) -> Any:
+    """Map an evaluated point (or list of points) to frame coordinates, keeping z as it is."""
+    if _is_number(value[0]):
+        return [(value[0] - offset[0]) * scale, (value[1] - offset[1]) * scale, *value[2:]]
+    return [_transform(point, scale, offset) for point in value]
+
+def fit_to_frame(json_schema: Dict[str, Any], keep_units: bool = False) -> Dict[str, Any]:
+    """Scale an evaluated scene down uniformly so it fits the 12x7 FRAME_SIZE frame.
+
+    The bounding box of all numeric geometry is computed at once. A scene
+    that already fits is left where it is; otherwise it is centered on the
+    origin and every coordinate and radius is multiplied by the same factor,
+    so the model can write the question's own measurements. The applied
+    "scale" and "offset" are recorded under "frame_fit". Measurements outside
+    the positions section (e.g. an entity's "radius" or a relationship's
+    "length") are scaled too, unless keep_units is True, in which case they
+    stay in the question's units for labels.
+    """
+    positions = json_schema.get("positions", {})
+    points, unevaluated = scene_points(positions)
+    if not len(points):
+        return json_schema
+    low, high = points.min(axis=0), points.max(axis=0)
+    if np.all(low >= -FRAME_SIZE / 2) and np.all(high <= FRAME_SIZE / 2):
+        return json_schema
+
+    offset = ((low + high) / 2).tolist()
+    size = high - low
+    scale = float(np.min(FRAME_SIZE[size > 0] / size[size > 0], initial=1.0))
+    for entity_id, position in positions.items():
+        # Entries that did not evaluate are left for the caller to report
+        if not isinstance(position, dict) or entity_id in unevaluated:
+            continue
+        for field in POINT_FIELDS:
+            if position.get(field):
+                position[field] = _transform(position[field], scale, offset)
+        if _is_number(position.get("radius")):
+            position["radius"] = position["radius"] * scale
+        if "radius" in position and not position.get("center"):
+            # A circle without a center is drawn at the origin, which moves with the scene
+            position["center"] = _transform([0, 0, 0], scale, offset)
+
+    if not keep_units:
+        for item in json_schema.get("entities", []) + json_schema.get("relationships", []):
+            for key, value in item.items():
+                if key in LENGTH_KEYS and _is_number(value):
+                    item[key] = value * scale
+    json_schema["frame_fit"] = {"scale": scale, "offset": offset}
     return json_schema
 
+def iter_position_strings(json_schema: Dict[str, Any]):
+    """Yield every string value in the positions section."""
+    def walk(value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for item in value.values():
+                yield from walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from walk(item)
+    yield from walk(json_schema.get("positions", {}))
+
+def _pad_point(value: Any) -> Any:
+    """Pad [x, y] points to [x, y, 0] so kernel arguments stack into regular arrays."""
+    if isinstance(value, list) and len(value) == 2 and all(isinstance(v, (int, float)) for v in value):
+        return value + [0]
+    return value
+
+@lru_cache(maxsize=None)
+def _point_parameters(name: str) -> Tuple[bool, ...]:
+    """For each parameter of a batch kernel, whether it takes points (centers, external points)."""
+    parameters = inspect.signature(BATCH_KERNELS[name]).parameters
+    return tuple(parameter.endswith(("centers", "points")) for parameter in parameters)
+
+def _columns_fit(name: str, columns: List[np.ndarray]) -> bool:
+    """Whether every point column is (n, 3) and every other column is one number per call."""
+    return all(column.ndim == 2 and column.shape[1] == 3 if is_point else column.ndim == 1
+               for column, is_point in zip(columns, _point_parameters(name)))
+
+def precompute_batch_calls(json_schemas: List[Dict[str, Any]]) -> CallMemo:
+    """Evaluate every literal helper call across the schemas with the batched kernels.
+
+    Calls are grouped by function name and argument count and each group is
+    dispatched to its kernel in one go. Returns a call memo for call_memo().
+    """
+    groups = defaultdict(dict)
+    for json_schema in json_schemas:
+        for value in iter_position_strings(json_schema):
+            for name, args in find_literal_calls(value):
+                if name in BATCH_KERNELS:
+                    groups[(name, len(args))].setdefault(call_key(name, args), args)
+
+    memo = CallMemo()
+    for (name, arg_count), calls in groups.items():
+        keys = list(calls.keys())
+        try:
+            columns = [np.array([_pad_point(args[i]) for args in calls.values()], dtype=float) for i in range(arg_count)]
+        except ValueError:
+            # Irregular arguments (e.g. malformed points) fall back to scalar evaluation
+            continue
+        if arg_count > len(_point_parameters(name)) or not _columns_fit(name, columns):
+            continue
+        try:
+            results = BATCH_KERNELS[name](*columns)
+        except (TypeError, ValueError, IndexError):
+            # Let the scalar path report the bad call for each scene
+            continue
+        for key, row in zip(keys, results):
+            memo[key] = None if np.isnan(row).any() else row.tolist()
+    return memo
+
+def evaluate_function_calls_batch(json_schemas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Evaluate many schemas at once, running literal helper calls through the batched kernels."""
+    memo = precompute_batch_calls(json_schemas)
+    with call_memo(memo):
+        return [evaluate_function_calls(json_schema) for json_schema in json_schemas]
+
+def main_batch(paths: List[str]):
+    """Evaluate several scene files in batch mode, writing <name>_final.json next to each."""
+    json_schemas = []
+    for path in paths:
+        with open(path, 'r') as f:
+            json_schemas.append(json.load(f))
+
+    for path, processed_schema in zip(paths, evaluate_function_calls_batch(json_schemas)):
+        output_path = f"{os.path.splitext(path)[0]}_final.json"
+        with open(output_path, 'w') as f:
+            json.dump(processed_schema, f, indent=2)
+    print(f"Successfully processed {len(paths)} scenes in batch mode")
+
 def main():
     try:
         # Read the input JSON file
@@ -177,7 +310,9 @@ def main():
             json_schema = json.load(f)
 
         # Process the positions using the functional approach
-        processed_schema = evaluate_function_calls(json_schema)
+        stats = {}
+        processed_schema = evaluate_function_calls(json_schema, stats)
+        print(f"Evaluated {stats['evaluated_calls']} distinct helper calls for {stats['call_sites']} call sites")
 
         # Write the processed JSON to the output file
         with open('current_scene_final.json', 'w') as f:
@@ -192,4 +327,7 @@ def main():
         print(f"An error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        main_batch(sys.argv[1:])
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,307 @@
+import ast
+import math
+import operator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from helper_functions import HELPER_FUNCTIONS
+
+# Plain math that expressions may use alongside the helper functions
+MATH_FUNCTIONS: Dict[str, Callable] = {
+    "sqrt": math.sqrt,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "radians": math.radians,
+    "degrees": math.degrees,
+    "abs": abs,
+}
+
+CONSTANTS = {
+    "pi": math.pi,
+    "true": True,
+    "false": False,
+    "null": None,
+    "none": None,
+}
+
+# Largest exponent and base ** accepts; model output beyond these is not
+# geometry, and exact integer powers of that size can hang the worker
+MAX_EXPONENT = 100
+MAX_POWER_BASE = 1e6
+# Largest power result accepted, so results stay finite floats
+MAX_POWER_RESULT = 1e100
+
+class ExpressionError(ValueError):
+    """Raised when a string is not a supported position expression."""
+
+def bounded_pow(base: Any, exponent: Any) -> Any:
+    """base ** exponent, refusing exponents, bases and results outside MAX_EXPONENT / MAX_POWER_BASE / MAX_POWER_RESULT.
+
+    Complex results (a negative base to a fractional power) are refused too.
+    """
+    if not (isinstance(base, (int, float)) and isinstance(exponent, (int, float))):
+        return operator.pow(base, exponent)
+    if abs(exponent) > MAX_EXPONENT or abs(base) > MAX_POWER_BASE:
+        raise ExpressionError(f"Power {base!r} ** {exponent!r} is out of range")
+    try:
+        result = operator.pow(base, exponent)
+    except (OverflowError, ZeroDivisionError) as e:
+        raise ExpressionError(f"Power {base!r} ** {exponent!r} is out of range: {e}")
+    if isinstance(result, complex) or abs(result) > MAX_POWER_RESULT:
+        raise ExpressionError(f"Power {base!r} ** {exponent!r} is not a finite real number")
+    return result
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: bounded_pow,
+    ast.Mod: operator.mod,
+}
+
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+def to_plain(value: Any) -> Any:
+    """Convert NumPy arrays/scalars and tuples returned by helpers into plain lists and floats."""
+    if isinstance(value, (list, tuple)):
+        try:
+            # Regular nested point lists convert in a single C pass
+            return np.array(value, dtype=float).tolist()
+        except (ValueError, TypeError):
+            return [to_plain(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def call_key(name: str, args: List[Any]) -> Tuple[str, Any]:
+    """Memo key for a helper call, treating 3 and 3.0 as the same argument."""
+    return name, _normalize(args)
+
+def _copy_plain(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_copy_plain(item) for item in value]
+    return value
+
+class CallMemo(dict):
+    """Helper call results keyed by call_key(), plus counters for deduplication reports.
+
+    calls counts every helper call evaluated under the memo, evaluated only
+    those that actually ran. A stored None means the helper returned None.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self.evaluated = 0
+
+# Helper call results shared by every expression evaluated inside call_memo()
+_call_memo: ContextVar[Optional[CallMemo]] = ContextVar("call_memo", default=None)
+
+# Evaluated positions that references like C1.center resolve against
+_references: ContextVar[Optional[Dict[str, Any]]] = ContextVar("references", default=None)
+
+@contextmanager
+def call_memo(memo: Optional[CallMemo] = None) -> Iterator[CallMemo]:
+    """Memoize helper calls by name and arguments for everything evaluated in this block.
+
+    A memo may be pre-filled (e.g. by the batched kernels).
+    """
+    memo = CallMemo() if memo is None else memo
+    token = _call_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _call_memo.reset(token)
+
+def current_call_memo() -> Optional[CallMemo]:
+    """The memo active in this context, if any."""
+    return _call_memo.get()
+
+@contextmanager
+def entity_references(positions: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Resolve references such as T1.endpoints[0] against `positions` inside this block."""
+    token = _references.set(positions)
+    try:
+        yield positions
+    finally:
+        _references.reset(token)
+
+def _resolve_reference(entity_id: str, field: str) -> Any:
+    positions = _references.get()
+    if positions is None or entity_id not in positions:
+        raise ValueError(f"Unknown entity reference {entity_id}.{field}")
+    position = positions[entity_id]
+    if not isinstance(position, dict) or field not in position:
+        raise ValueError(f"Entity {entity_id} has no position field '{field}'")
+    value = position[field]
+    if isinstance(value, str):
+        raise ValueError(f"{entity_id}.{field} could not be evaluated")
+    return _copy_plain(value)
+
+_NOT_LITERAL = object()
+
+def _literal(node: ast.AST) -> Any:
+    """The value of a literal number/list node, or _NOT_LITERAL."""
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return _NOT_LITERAL
+
+def _compile_node(node: ast.AST, functions: Dict[str, Callable]) -> Callable[[], Any]:
+    """Turn a whitelisted AST node into a zero-argument closure."""
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float, str, bool, type(None))):
+            raise ExpressionError(f"Unsupported constant {node.value!r}")
+        value = node.value
+        return lambda: value
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile_node(item, functions) for item in node.elts]
+        return lambda: [item() for item in items]
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op = UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand, functions)
+        return lambda: op(operand())
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        op = BINARY_OPERATORS[type(node.op)]
+        left = _compile_node(node.left, functions)
+        right = _compile_node(node.right, functions)
+        return lambda: op(left(), right())
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name.lower() in CONSTANTS:
+            value = CONSTANTS[name.lower()]
+            return lambda: value
+        raise ExpressionError(f"Unknown name '{name}'")
+
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+        entity_id = node.value.id
+        field = node.attr
+        return lambda: _resolve_reference(entity_id, field)
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            raise ExpressionError("Only direct calls to named functions are allowed")
+        name = node.func.id
+        if name in functions:
+            func = functions[name]
+        elif name in MATH_FUNCTIONS:
+            func = MATH_FUNCTIONS[name]
+        else:
+            raise ExpressionError(f"Unknown function '{name}'")
+        args = [_compile_node(arg, functions) for arg in node.args]
+        kwargs = {kw.arg: _compile_node(kw.value, functions) for kw in node.keywords if kw.arg}
+        # Helpers never mutate their arguments, so literal arguments are built once at compile time
+        constant_args = [_literal(arg) for arg in node.args]
+        if kwargs or any(value is _NOT_LITERAL for value in constant_args):
+            def call_args():
+                return [arg() for arg in args], {key: value() for key, value in kwargs.items()}
+        else:
+            def call_args():
+                return constant_args, {}
+
+        memoize = name in functions
+
+        def call():
+            positional, keywords = call_args()
+            memo = _call_memo.get() if memoize and not keywords else None
+            if memo is None:
+                result = to_plain(func(*positional, **keywords))
+            else:
+                memo.calls += 1
+                key = call_key(name, positional)
+                if key in memo:
+                    result = _copy_plain(memo[key])
+                else:
+                    memo.evaluated += 1
+                    result = to_plain(func(*positional))
+                    memo[key] = _copy_plain(result)
+            if result is None:
+                raise ValueError(f"{name} returned None")
+            return result
+        return call
+
+    if isinstance(node, ast.Subscript):
+        value = _compile_node(node.value, functions)
+        index = _compile_node(node.slice, functions)
+
+        def subscript():
+            position = index()
+            if isinstance(position, float) and position.is_integer():
+                position = int(position)
+            return value()[position]
+        return subscript
+
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+@lru_cache(maxsize=8192)
+def compile_expression(expression: str) -> Callable[[], Any]:
+    """Parse a position expression once into a callable, cached by expression string.
+
+    Supports numbers, strings, lists, unary minus, + - * / % and bounded **, indexing,
+    sqrt/sin/cos/tan/radians/degrees, pi, references to other entities'
+    positions (C1.center, T1.endpoints[0]) and nested calls to the registered
+    helper functions. Anything else raises ExpressionError.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}")
+    return _compile_node(tree.body, HELPER_FUNCTIONS)
+
+def evaluate_expression(expression: str) -> Any:
+    """Compile (or fetch from cache) and evaluate a position expression."""
+    return compile_expression(expression)()
+
+def find_literal_calls(expression: str) -> List[Tuple[str, List[Any]]]:
+    """Helper calls in an expression whose arguments are all literals, as (name, args) pairs."""
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        return []
+    calls = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in HELPER_FUNCTIONS and not node.keywords):
+            args = [_literal(arg) for arg in node.args]
+            if all(arg is not _NOT_LITERAL for arg in args):
+                calls.append((node.func.id, args))
+    return calls
+
+def find_references(value: Any) -> Set[str]:
+    """Entity ids referenced (as ID.field) by the expressions in a position value."""
+    if isinstance(value, dict):
+        return set().union(*[find_references(item) for item in value.values()])
+    if isinstance(value, list):
+        return set().union(*[find_references(item) for item in value])
+    if not isinstance(value, str):
+        return set()
+    try:
+        tree = ast.parse(value.strip(), mode='eval')
+    except SyntaxError:
+        return set()
+    return {
+        node.value.id for node in ast.walk(tree)
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+    }
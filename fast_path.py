@@ -0,0 +1,172 @@
+import copy
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from compute_position import evaluate_function_calls, quiet_evaluation, scene_points
+
+VERB = r'(?:draw|make|construct)'
+UNIT = r'(?:\s*(?:cm|mm|m|units?)\b)?'
+CIRCLE = rf'a circle (?:of|with) radius {{radius}}'
+TANGENTS_BY_LENGTH = (rf'{VERB} (?:(?:two|2) tangents|an? tangent(?P<single>)) of length {{tangent}}(?: each)? from (?:an? |the )?'
+                      rf'(?:external )?point (?P<point>[A-Z])(?: outside the circle| to the circle)?')
+TANGENTS_BY_ANGLE = (rf'{VERB} (?:two|2) tangents(?: from an? (?:external )?point (?P<point>[A-Z]))?'
+                     rf'(?: inclined to each other)? at an angle of (?P<angle>\d+(?:\.\d+)?) ?(?:degrees|°)')
+
+def _pattern(template: str) -> re.Pattern:
+    """Compile a rule, expanding {name} into a number group with an optional unit."""
+    pattern = re.sub(r'\{(\w+)\}', lambda match: rf'(?P<{match.group(1)}>\d+(?:\.\d+)?){UNIT}', template)
+    return re.compile(pattern, re.IGNORECASE)
+
+def _number(value: float) -> Any:
+    """Numbers as the model writes them: integers plain, others to three decimals."""
+    value = round(value, 3)
+    return int(value) if value.is_integer() else value
+
+def _circle(scene: Dict[str, Any], radius: float, color: str = "BLUE"):
+    scene["entities"].append({"type": "circle", "id": "C1", "color": color})
+    scene["positions"]["C1"] = {"center": [0, 0, 0], "radius": _number(radius)}
+
+def _polygon(scene: Dict[str, Any], entity_id: str, sides: int, vertices: str, color: str):
+    scene["entities"].append({"type": "polygon", "id": entity_id, "sides": sides, "color": color})
+    scene["positions"][entity_id] = {"vertices": vertices}
+
+def _tangents(scene: Dict[str, Any], call: str, point: Optional[str], count: int = 2):
+    """One or two tangents from one external point, given the helper call returning both [T, P] pairs."""
+    point_id = (point or "P").upper()
+    for index, line_id in enumerate(("T1", "T2")[:count]):
+        scene["entities"].append({"type": "line", "id": line_id, "color": "PURPLE"})
+        scene["relationships"].append({"type": "tangent", "line": line_id, "to": "C1"})
+        scene["relationships"].append({"type": "passes_through", "line": line_id, "point": point_id})
+        scene["positions"][line_id] = {"endpoints": f"{call}[{index}]"}
+    scene["entities"].append({"type": "point", "id": point_id, "color": "RED"})
+    scene["positions"][point_id] = {"coordinates": f"{call}[0][1]"}
+
+def _circle_scene(values: Dict[str, Any]) -> Dict[str, Any]:
+    scene = {"entities": [], "relationships": [], "positions": {}}
+    _circle(scene, values["radius"])
+    return scene
+
+def _circle_chord_scene(values: Dict[str, Any]) -> Dict[str, Any]:
+    scene = _circle_scene(values)
+    scene["entities"].append({"type": "line", "id": "CH1", "color": "RED"})
+    scene["relationships"].append({"type": "chord", "line": "CH1", "of": "C1"})
+    if values.get("chord") is not None:
+        call = f"get_chord_from_length([0, 0, 0], {_number(values['radius'])}, {_number(values['chord'])})"
+    else:
+        call = f"get_chord_from_center_distance([0, 0, 0], {_number(values['radius'])}, {_number(values['distance'])})"
+    scene["positions"]["CH1"] = {"endpoints": call}
+    return scene
+
+def _circle_tangents_scene(values: Dict[str, Any]) -> Dict[str, Any]:
+    scene = _circle_scene(values)
+    if values.get("square"):
+        side = values["radius"] * math.sqrt(2)
+        _polygon(scene, "S1", 4, f"get_square_vertices([0, 0, 0], {_number(side)}, 0)", "GREEN")
+        scene["relationships"].append({"type": "inscribed", "shape": "S1", "in": "C1"})
+    if values.get("tangent") is not None:
+        _tangents(scene, f"get_tangent_by_length_of_tangent([0, 0, 0], {_number(values['radius'])}, "
+                         f"{_number(values['tangent'])})", values.get("point"), 1 if values.get("single") else 2)
+    elif values.get("angle") is not None:
+        _tangents(scene, f"get_tangent_by_angle_between_tangents([0, 0, 0], {_number(values['radius'])}, "
+                         f"{round(math.radians(values['angle']), 4)})", values.get("point"))
+    return scene
+
+def _polygon_scene(call: str, sides: int, color: str, entity_id: str = "T1") -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Builder for a single polygon whose vertices come from `call` formatted with the matched values."""
+    def build(values: Dict[str, Any]) -> Dict[str, Any]:
+        scene = {"entities": [], "relationships": [], "positions": {}}
+        _polygon(scene, entity_id, sides,
+                 call.format(**{key: _number(value) for key, value in values.items() if isinstance(value, float)}), color)
+        return scene
+    return build
+
+# (rule name, pattern matching the whole prompt, scene builder). Groups other
+# than "angle", "point", "single" and "square" are lengths.
+FAST_PATH_RULES: List[Tuple[str, re.Pattern, Callable[[Dict[str, Any]], Dict[str, Any]]]] = [
+    ("circle", _pattern(rf'{VERB} {CIRCLE}'), _circle_scene),
+    ("circle_chord", _pattern(rf'{VERB} {CIRCLE},? with a chord (?:of length )?{{chord}}(?: long)?'),
+     _circle_chord_scene),
+    ("circle_chord_distance",
+     _pattern(rf'{VERB} {CIRCLE},? with a chord at (?:a )?distance (?:of )?{{distance}} from (?:the|its) cent(?:re|er)'),
+     _circle_chord_scene),
+    ("circle_tangents", _pattern(rf'{VERB} {CIRCLE}\. {TANGENTS_BY_LENGTH}'), _circle_tangents_scene),
+    ("circle_tangent_angle", _pattern(rf'{VERB} {CIRCLE}\. {TANGENTS_BY_ANGLE}'), _circle_tangents_scene),
+    ("inscribed_square",
+     _pattern(rf'(?:inscribe a square in|{VERB} a square inscribed in) {CIRCLE}(?P<square>)(?:\. {TANGENTS_BY_LENGTH})?'),
+     _circle_tangents_scene),
+    ("equilateral_triangle", _pattern(rf'{VERB} an equilateral triangle (?:of|with) side(?: length)? {{side}}'),
+     _polygon_scene("get_equilateral_triangle_vertices([0, 0, 0], {side}, 0)", 3, "BLUE")),
+    ("right_triangle", _pattern(rf'{VERB} a right(?:[- ]angled)? triangle with base {{base}} and height {{height}}'),
+     _polygon_scene("get_right_triangle_vertices([0, 0, 0], {base}, {height}, 0)", 3, "BLUE")),
+    ("isosceles_triangle", _pattern(rf'{VERB} an isosceles triangle with equal sides {{equal}} and base {{base}}'),
+     _polygon_scene("get_isosceles_triangle_vertices([0, 0, 0], {equal}, {base}, 0)", 3, "PURPLE")),
+    ("square", _pattern(rf'{VERB} a square (?:of|with) side(?: length)? {{side}}'),
+     _polygon_scene("get_square_vertices([0, 0, 0], {side}, 0)", 4, "BLUE", "S1")),
+    ("rectangle", _pattern(rf'{VERB} a rectangle (?:of|with) length {{length}} and (?:width|breadth) {{width}}'),
+     _polygon_scene("get_rectangle_vertices([0, 0, 0], {length}, {width}, 0)", 4, "BLUE", "R1")),
+]
+
+def _constructible(json_schema: Dict[str, Any]) -> bool:
+    """Whether every position evaluates to numbers; a chord longer than the diameter, for example, does not."""
+    with quiet_evaluation():
+        positions = evaluate_function_calls(copy.deepcopy(json_schema), fit=False)["positions"]
+    return not scene_points(positions)[1]
+
+def parse_prompt(description: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Schema for a prompt one of FAST_PATH_RULES matches in full, as (rule name, schema), else None.
+
+    Lengths are kept in the prompt's units; compute_position fits the
+    evaluated scene to the frame. A match whose geometry cannot be
+    constructed is left to the LLM.
+    """
+    text = " ".join(description.split()).rstrip(". ")
+    for name, pattern, build in FAST_PATH_RULES:
+        match = pattern.fullmatch(text)
+        if match is None:
+            continue
+        values: Dict[str, Any] = {}
+        for key, value in match.groupdict().items():
+            if key in ("point", "single", "square"):
+                values[key] = value if key == "point" else value is not None
+            elif value is not None:
+                values[key] = float(value)
+        json_schema = build(values)
+        if not _constructible(json_schema):
+            return None
+        if not json_schema["relationships"]:
+            del json_schema["relationships"]
+        return name, json_schema
+    return None
+
+class FastPathStats:
+    """How much traffic the rules handle, per rule, and how long rule parses take."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rules: Counter = Counter()
+        self.misses = 0
+        self.seconds = 0.0
+
+    def record(self, rule: Optional[str], seconds: float):
+        with self.lock:
+            if rule is None:
+                self.misses += 1
+            else:
+                self.rules[rule] += 1
+                self.seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            handled = sum(self.rules.values())
+            return {
+                "handled": handled,
+                "fallbacks": self.misses,
+                "share": handled / (handled + self.misses) if handled + self.misses else 0.0,
+                "mean_ms": self.seconds / handled * 1000 if handled else 0.0,
+                "rules": dict(self.rules),
+            }
+
+fast_path_stats = FastPathStats()
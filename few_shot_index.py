@@ -0,0 +1,173 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+EXAMPLE_HEADING = re.compile(r'^#{1,3}\s*(COMPLEX\s+)?EXAMPLE\b', re.IGNORECASE)
+WORD = re.compile(r'[a-z]+')
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "cm", "draw", "each", "for", "from", "has",
+    "have", "in", "is", "it", "its", "make", "of", "on", "such", "that", "the", "their", "them",
+    "then", "this", "to", "with"
+}
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt token estimate (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+def stem(word: str) -> str:
+    """Strip common English suffixes so inscribe/inscribed and tangent/tangents match."""
+    for suffix in ("ing", "ed", "es", "s", "e"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-letters (so get_tangent_by_point yields its words), drop stopwords and stem."""
+    return [stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+@dataclass
+class FewShotSection:
+    """One example (or the function reference preamble) from a few-shot file."""
+    section_id: str
+    file_path: str
+    text: str
+    is_reference: bool
+    tokens: int
+    terms: Counter
+
+@dataclass
+class FewShotSelection:
+    """The examples picked for a question and how many prompt tokens they cost."""
+    text: str
+    section_ids: List[str]
+    tokens: int
+    baseline_tokens: int
+    scores: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.baseline_tokens - self.tokens
+
+def split_sections(file_path: str) -> List[FewShotSection]:
+    """Split a few-shot file into its reference preamble and one section per example."""
+    with open(file_path, 'r') as f:
+        lines = f.read().splitlines(keepends=True)
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    chunks = [[]]
+    for line in lines:
+        if EXAMPLE_HEADING.match(line) and chunks[-1]:
+            chunks.append([])
+        chunks[-1].append(line)
+
+    sections = []
+    for index, chunk in enumerate(chunks):
+        text = "".join(chunk).strip()
+        if not text:
+            continue
+        is_reference = not EXAMPLE_HEADING.match(chunk[0])
+        # Score examples on their heading, query and reasoning; the JSON is boilerplate
+        searchable = text if is_reference else text.split("JSON Output:")[0]
+        sections.append(FewShotSection(
+            section_id=f"{name}#{'ref' if is_reference else index}",
+            file_path=file_path,
+            text=text + "\n\n",
+            is_reference=is_reference,
+            tokens=estimate_tokens(text + "\n\n"),
+            terms=Counter(tokenize(searchable))
+        ))
+    return sections
+
+class FewShotIndex:
+    """BM25 index over few-shot example sections, built once and queried per question."""
+
+    def __init__(self, sections: List[FewShotSection], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self.file_tokens = Counter()
+        for section in sections:
+            self.file_tokens[section.file_path] += section.tokens
+
+        examples = [section for section in sections if not section.is_reference]
+        self.average_length = sum(sum(s.terms.values()) for s in examples) / max(1, len(examples))
+        document_frequency = Counter()
+        for section in examples:
+            document_frequency.update(section.terms.keys())
+        n = len(examples)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "FewShotIndex":
+        sections = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.txt'):
+                sections.extend(split_sections(os.path.join(directory, name)))
+        return cls(sections)
+
+    def score(self, query_terms: List[str], section: FewShotSection) -> float:
+        """BM25 score of a section for the query terms."""
+        length = sum(section.terms.values())
+        score = 0.0
+        for term in set(query_terms):
+            frequency = section.terms.get(term, 0)
+            if not frequency:
+                continue
+            norm = frequency + self.k1 * (1 - self.b + self.b * length / max(1.0, self.average_length))
+            score += self.idf.get(term, 0.0) * frequency * (self.k1 + 1) / norm
+        return score
+
+    def select(self, description: str, token_budget: int = 2000, max_examples: int = 3,
+               min_relative_score: float = 0.7, baseline_files: List[str] = ()) -> FewShotSelection:
+        """Pick the best-scoring examples, plus their file's function reference, within the token budget.
+
+        Examples scoring below min_relative_score times the best score are
+        dropped so weak matches do not drag in another file's reference.
+        baseline_files are the files the old keyword scan would have included;
+        their size is reported as baseline_tokens for the savings report.
+        """
+        query_terms = tokenize(description)
+        scored = []
+        for section in self.sections:
+            if section.is_reference:
+                continue
+            score = self.score(query_terms, section)
+            if score > 0:
+                scored.append((score, section))
+        scored.sort(key=lambda item: -item[0])
+
+        references = {s.file_path: s for s in self.sections if s.is_reference}
+        chosen_references: List[FewShotSection] = []
+        chosen_examples: List[FewShotSection] = []
+        scores = {}
+        used = 0
+        for score, section in scored:
+            if len(chosen_examples) >= max_examples or score < min_relative_score * scored[0][0]:
+                break
+            cost = section.tokens
+            reference = references.get(section.file_path)
+            needs_reference = reference is not None and reference not in chosen_references
+            if needs_reference:
+                cost += reference.tokens
+            if used + cost > token_budget:
+                continue
+            if needs_reference:
+                chosen_references.append(reference)
+            chosen_examples.append(section)
+            scores[section.section_id] = round(score, 3)
+            used += cost
+
+        chosen = chosen_references + chosen_examples
+        return FewShotSelection(
+            text="".join(section.text for section in chosen),
+            section_ids=[section.section_id for section in chosen],
+            tokens=used,
+            baseline_tokens=sum(self.file_tokens[path] for path in baseline_files),
+            scores=scores
+        )
@@ -1,19 +1,40 @@
 import json
 import numpy as np
 from typing import Dict, List, Any, Optional
-from manim import *
-from helper_functions import *
+from tracing import span
 
-def main(json_file_path: str, output_file_path: str = "generated_scene.py") -> str:
+# Entity types drawn as a filled Polygon through their "vertices"
+POLYGON_TYPES = ("triangle", "square", "rectangle", "polygon")
+
+# Every entity type the code generator (and JSONScene) draws, with the position fields it reads
+ENTITY_POSITION_FIELDS = {
+    "circle": ("center", "radius"),
+    "semicircle": ("center", "radius"),
+    "point": ("coordinates",),
+    "line": ("endpoints",),
+    **{entity_type: ("vertices",) for entity_type in POLYGON_TYPES},
+}
+
+def semicircle_geometry(center: List[float], radius: float, orientation: str = "up"):
+    """Start angle of the arc and the diameter endpoints for a semicircle facing `orientation`."""
+    if orientation == "down":
+        return np.pi, [center[0] + radius, center[1], 0], [center[0] - radius, center[1], 0]
+    if orientation == "left":
+        return np.pi/2, [center[0], center[1] + radius, 0], [center[0], center[1] - radius, 0]
+    if orientation == "right":
+        return -np.pi/2, [center[0], center[1] + radius, 0], [center[0], center[1] - radius, 0]
+    # "up" or default
+    return 0, [center[0] + radius, center[1], 0], [center[0] - radius, center[1], 0]
+
+def generate_scene_code(scene_data: Dict[str, Any], class_name: str = "GeneratedScene") -> str:
     """
-    Convert JSON geometric data to Manim scene code.
+    Convert evaluated scene data to Manim scene code.
     Assumes all function calls have already been evaluated.
     """
-    
-    # Read JSON file
-    with open(json_file_path, 'r') as f:
-        scene_data = json.load(f)
-    
+    with span("codegen", entities=len(scene_data["entities"])):
+        return _generate_scene_code(scene_data, class_name)
+
+def _generate_scene_code(scene_data: Dict[str, Any], class_name: str) -> str:
     entities = {entity["id"]: entity for entity in scene_data["entities"]}
     positions = scene_data["positions"]
     relationships = scene_data.get("relationships", [])
@@ -24,9 +45,9 @@ import numpy as np
 from math import sqrt
 from helper_functions import *
 
-class GeneratedScene(Scene):
+class {class_name}(Scene):
     def construct(self):
-'''
+'''.format(class_name=class_name)
     
     entity_objects = {}
     
@@ -53,23 +74,7 @@ class GeneratedScene(Scene):
             radius = pos["radius"]
             orientation = entity_info.get("orientation", "up")
             
-            # Set start angle and diameter endpoints based on orientation
-            if orientation == "down":
-                start_angle = np.pi
-                diameter_start = [center[0] + radius, center[1], 0]
-                diameter_end = [center[0] - radius, center[1], 0]
-            elif orientation == "left":
-                start_angle = np.pi/2
-                diameter_start = [center[0], center[1] + radius, 0]
-                diameter_end = [center[0], center[1] - radius, 0]
-            elif orientation == "right":
-                start_angle = -np.pi/2
-                diameter_start = [center[0], center[1] + radius, 0]
-                diameter_end = [center[0], center[1] - radius, 0]
-            else:  # "up" or default
-                start_angle = 0
-                diameter_start = [center[0] + radius, center[1], 0]
-                diameter_end = [center[0] - radius, center[1], 0]
+            start_angle, diameter_start, diameter_end = semicircle_geometry(center, radius, orientation)
             
             code += f"        # Create semicircle {entity_id}\n"
             code += f"        {entity_id}_arc = Arc(radius={radius}, start_angle={start_angle}, angle=np.pi, arc_center=np.array([{center[0]}, {center[1]}, 0]))\n"
@@ -82,39 +87,6 @@ class GeneratedScene(Scene):
             code += f"        {entity_id}.set_fill({manim_color}, opacity=0.3)\n"
             entity_objects[entity_id] = {"type": "semicircle", "manim_obj": f"{entity_id}"}
         
-        elif entity_type == "square":
-            vertices = pos["vertices"]
-            code += f"        {entity_id} = Polygon(\n"
-            for vertex in vertices:
-                code += f"            np.array([{vertex[0]}, {vertex[1]}, {vertex[2]}]),\n"
-            code = code.rstrip(',\n') + '\n'
-            code += f"        )\n"
-            code += f"        {entity_id}.set_stroke({manim_color}, width=2)\n"
-            code += f"        {entity_id}.set_fill({manim_color}, opacity=0.3)\n"
-            entity_objects[entity_id] = {"type": "square", "manim_obj": f"{entity_id}"}
-        
-        elif entity_type == "rectangle":
-            vertices = pos["vertices"]
-            code += f"        {entity_id} = Polygon(\n"
-            for vertex in vertices:
-                code += f"            np.array([{vertex[0]}, {vertex[1]}, {vertex[2]}]),\n"
-            code = code.rstrip(',\n') + '\n'
-            code += f"        )\n"
-            code += f"        {entity_id}.set_stroke({manim_color}, width=2)\n"
-            code += f"        {entity_id}.set_fill({manim_color}, opacity=0.3)\n"
-            entity_objects[entity_id] = {"type": "rectangle", "manim_obj": f"{entity_id}"}
-        
-        elif entity_type == "triangle":
-            vertices = pos["vertices"]
-            code += f"        {entity_id} = Polygon(\n"
-            for vertex in vertices:
-                code += f"            np.array([{vertex[0]}, {vertex[1]}, {vertex[2]}]),\n"
-            code = code.rstrip(',\n') + '\n'
-            code += f"        )\n"
-            code += f"        {entity_id}.set_stroke({manim_color}, width=2)\n"
-            code += f"        {entity_id}.set_fill({manim_color}, opacity=0.3)\n"
-
-        
         elif entity_type == "point":
             coords = pos["coordinates"]
             if isinstance(coords, str):
@@ -162,7 +134,7 @@ class GeneratedScene(Scene):
             code += f"        {entity_id}.set_stroke(color={manim_color})\n"
             entity_objects[entity_id] = {"type": "line", "manim_obj": f"{entity_id}"}
         
-        elif entity_type == "polygon":
+        elif entity_type in POLYGON_TYPES:
             vertices = pos["vertices"]
             code += f"        {entity_id} = Polygon(\n"
             for vertex in vertices:
@@ -171,7 +143,9 @@ class GeneratedScene(Scene):
             code += f"        )\n"
             code += f"        {entity_id}.set_stroke({manim_color}, width=2)\n"
             code += f"        {entity_id}.set_fill({manim_color}, opacity=0.3)\n"
-            entity_objects[entity_id] = {"type": "polygon", "manim_obj": f"{entity_id}"}
+            # Triangles are registered (and so added to the scene) like every other polygon; the
+            # original per-type branches built them but never added them
+            entity_objects[entity_id] = {"type": entity_type, "manim_obj": f"{entity_id}"}
     
     # Add all objects to the scene
     code += "\n        # Add all objects to the scene\n"
@@ -182,8 +156,21 @@ class GeneratedScene(Scene):
         elif entity_objects[entity_id]["type"] == "point":
             code += f"        self.add({entity_id}_label)\n"
     
-    code += '''
-# To render: manim generated_scene.py GeneratedScene -pql
+    return code
+
+def main(json_file_path: str, output_file_path: str = "generated_scene.py") -> str:
+    """
+    Convert JSON geometric data to Manim scene code.
+    Assumes all function calls have already been evaluated.
+    """
+    
+    # Read JSON file
+    with open(json_file_path, 'r') as f:
+        scene_data = json.load(f)
+    
+    code = generate_scene_code(scene_data)
+    code += f'''
+# To render: manim {output_file_path} GeneratedScene -pql
 '''
     
     # Write to output file
@@ -1,4 +1,3 @@
-from manim import *
 import numpy as np
 from typing import List, Tuple, Optional
 
@@ -415,4 +414,193 @@ def get_triangle_type(sides: Optional[List[float]] = None, angles: Optional[List
         # If not any special case, it's scalene
         return "scalene"
     
-    return "unknown"
\ No newline at end of file
+    return "unknown"
+
+# Functions that scene expressions (e.g. "get_square_vertices([0, 0, 0], 3, 0)") may call
+HELPER_FUNCTIONS = {
+    func.__name__: func
+    for func in [
+        get_square_vertices,
+        get_rectangle_vertices,
+        get_equilateral_triangle_vertices,
+        get_isosceles_triangle_vertices,
+        get_right_triangle_vertices,
+        get_scalene_triangle_vertices,
+        get_triangle_vertices_from_angles_side,
+        get_inscribed_circle,
+        get_circumscribed_circle,
+        get_common_chord,
+        get_chord_from_center_distance,
+        get_chord_from_length,
+        get_tangent_by_point,
+        get_tangent_by_angle_between_tangents,
+        get_tangent_by_angle_with_radius,
+        get_tangent_by_distance_from_center,
+        get_tangent_by_length_of_tangent,
+    ]
+}
+
+def _as_points(points, count: int) -> np.ndarray:
+    """Broadcast [x, y] or [x, y, z] points to an (N, 3) float array."""
+    points = np.asarray(points, dtype=float)
+    if points.ndim == 1:
+        points = np.broadcast_to(points, (count, points.shape[0]))
+    if points.shape[1] == 2:
+        points = np.concatenate([points, np.zeros((len(points), 1))], axis=1)
+    return points
+
+def _batch_size(*args) -> int:
+    """Number of shapes in a batch call, taken from the longest array argument."""
+    return max(np.asarray(arg).shape[0] if np.ndim(arg) > 0 else 1 for arg in args)
+
+def _place_vertices_batch(local_vertices: np.ndarray, centers: np.ndarray, orientations) -> np.ndarray:
+    """Rotate (N, k, 2) local vertices by each orientation and translate to each (N, 3) center."""
+    orientations = np.broadcast_to(np.asarray(orientations, dtype=float), (len(centers),))
+    cos_theta = np.cos(orientations)[:, None]
+    sin_theta = np.sin(orientations)[:, None]
+    x = local_vertices[..., 0]
+    y = local_vertices[..., 1]
+    vertices = np.empty(local_vertices.shape[:2] + (3,))
+    vertices[..., 0] = x*cos_theta - y*sin_theta + centers[:, 0:1]
+    vertices[..., 1] = x*sin_theta + y*cos_theta + centers[:, 1:2]
+    vertices[..., 2] = centers[:, 2:3]
+    return vertices
+
+def get_square_vertices_batch(centers, side_lengths, orientations=0) -> np.ndarray:
+    """Batched get_square_vertices: returns an (N, 4, 3) array."""
+    n = _batch_size(centers, side_lengths, orientations)
+    half = np.broadcast_to(np.asarray(side_lengths, dtype=float), (n,))[:, None] / 2
+    signs = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=float)
+    return _place_vertices_batch(signs[None] * half[..., None], _as_points(centers, n), orientations)
+
+def get_rectangle_vertices_batch(centers, lengths, widths, orientations=0) -> np.ndarray:
+    """Batched get_rectangle_vertices: returns an (N, 4, 3) array."""
+    n = _batch_size(centers, lengths, widths, orientations)
+    half_lengths = np.broadcast_to(np.asarray(lengths, dtype=float), (n,)) / 2
+    half_widths = np.broadcast_to(np.asarray(widths, dtype=float), (n,)) / 2
+    signs = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=float)
+    local = signs[None] * np.stack([half_lengths, half_widths], axis=1)[:, None, :]
+    return _place_vertices_batch(local, _as_points(centers, n), orientations)
+
+def _triangle_batch(centers, heights, x_offsets, orientations, n) -> np.ndarray:
+    """Triangles laid out like the scalar helpers: two vertices at -height/3, the third at 2*height/3."""
+    local = np.empty((n, 3, 2))
+    local[:, 0] = np.stack([x_offsets[0], -heights/3], axis=1)
+    local[:, 1] = np.stack([x_offsets[1], -heights/3], axis=1)
+    local[:, 2] = np.stack([x_offsets[2], 2*heights/3], axis=1)
+    return _place_vertices_batch(local, _as_points(centers, n), orientations)
+
+def get_equilateral_triangle_vertices_batch(centers, side_lengths, orientations=0) -> np.ndarray:
+    """Batched get_equilateral_triangle_vertices: returns an (N, 3, 3) array."""
+    n = _batch_size(centers, side_lengths, orientations)
+    sides = np.broadcast_to(np.asarray(side_lengths, dtype=float), (n,))
+    heights = sides * np.sqrt(3) / 2
+    return _triangle_batch(centers, heights, (-sides/2, sides/2, np.zeros(n)), orientations, n)
+
+def get_isosceles_triangle_vertices_batch(centers, equal_sides, bases, orientations=0) -> np.ndarray:
+    """Batched get_isosceles_triangle_vertices: returns an (N, 3, 3) array, NaN where equal_sides <= base/2."""
+    n = _batch_size(centers, equal_sides, bases, orientations)
+    equal_sides = np.broadcast_to(np.asarray(equal_sides, dtype=float), (n,))
+    bases = np.broadcast_to(np.asarray(bases, dtype=float), (n,))
+    with np.errstate(invalid='ignore'):
+        heights = np.where(equal_sides > bases/2, np.sqrt(equal_sides**2 - (bases/2)**2), np.nan)
+    vertices = _triangle_batch(centers, heights, (-bases/2, bases/2, np.zeros(n)), orientations, n)
+    vertices[np.isnan(heights)] = np.nan
+    return vertices
+
+def get_right_triangle_vertices_batch(centers, bases, heights, orientations=0) -> np.ndarray:
+    """Batched get_right_triangle_vertices: returns an (N, 3, 3) array."""
+    n = _batch_size(centers, bases, heights, orientations)
+    bases = np.broadcast_to(np.asarray(bases, dtype=float), (n,))
+    heights = np.broadcast_to(np.asarray(heights, dtype=float), (n,))
+    return _triangle_batch(centers, heights, (-bases/3, 2*bases/3, -bases/3), orientations, n)
+
+def get_tangent_by_point_batch(circle_centers, circle_radii, external_points) -> np.ndarray:
+    """Batched get_tangent_by_point: returns (N, 2, 2, 3) [[T1, P], [T2, P]], NaN where P is not outside the circle."""
+    n = _batch_size(circle_centers, circle_radii, external_points)
+    O = _as_points(circle_centers, n)
+    P = _as_points(external_points, n)
+    radii = np.broadcast_to(np.asarray(circle_radii, dtype=float), (n,))
+    OP = P[:, :2] - O[:, :2]
+    d = np.hypot(OP[:, 0], OP[:, 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        theta = np.where(d > radii, np.arccos(radii / d), np.nan)
+    phi = np.arctan2(OP[:, 1], OP[:, 0])
+
+    tangents = np.empty((n, 2, 2, 3))
+    for i, angle in enumerate((phi + theta, phi - theta)):
+        tangents[:, i, 0, 0] = O[:, 0] + radii*np.cos(angle)
+        tangents[:, i, 0, 1] = O[:, 1] + radii*np.sin(angle)
+        tangents[:, i, 0, 2] = O[:, 2]
+        tangents[:, i, 1, 0] = P[:, 0]
+        tangents[:, i, 1, 1] = P[:, 1]
+        tangents[:, i, 1, 2] = O[:, 2]
+    tangents[np.isnan(theta)] = np.nan
+    return tangents
+
+def get_tangent_by_distance_from_center_batch(circle_centers, circle_radii, distances_from_center) -> np.ndarray:
+    """Batched get_tangent_by_distance_from_center: returns (N, 2, 2, 3), NaN where the point is not outside."""
+    n = _batch_size(circle_centers, circle_radii, distances_from_center)
+    O = _as_points(circle_centers, n)
+    distances = np.broadcast_to(np.asarray(distances_from_center, dtype=float), (n,))
+    P = O.copy()
+    P[:, 0] += distances
+    return get_tangent_by_point_batch(O, circle_radii, P)
+
+def get_tangent_by_length_of_tangent_batch(circle_centers, circle_radii, lengths_of_tangent) -> np.ndarray:
+    """Batched get_tangent_by_length_of_tangent: returns (N, 2, 2, 3)."""
+    radii = np.asarray(circle_radii, dtype=float)
+    lengths = np.asarray(lengths_of_tangent, dtype=float)
+    return get_tangent_by_distance_from_center_batch(circle_centers, circle_radii, np.sqrt(lengths**2 + radii**2))
+
+def get_tangent_by_angle_between_tangents_batch(circle_centers, circle_radii, angles) -> np.ndarray:
+    """Batched get_tangent_by_angle_between_tangents: returns (N, 2, 2, 3)."""
+    radii = np.asarray(circle_radii, dtype=float)
+    with np.errstate(divide='ignore'):
+        distances = radii / np.sin(np.asarray(angles, dtype=float)/2)
+    return get_tangent_by_distance_from_center_batch(circle_centers, circle_radii, distances)
+
+def get_tangent_by_angle_with_radius_batch(circle_centers, circle_radii, angles) -> np.ndarray:
+    """Batched get_tangent_by_angle_with_radius: returns (N, 2, 3)."""
+    return get_tangent_by_angle_between_tangents_batch(circle_centers, circle_radii, np.asarray(angles, dtype=float)*2)[:, 0]
+
+def get_chord_from_center_distance_batch(circle_centers, circle_radii, distances_from_center) -> np.ndarray:
+    """Batched get_chord_from_center_distance: returns (N, 2, 3), NaN where |distance| >= radius."""
+    n = _batch_size(circle_centers, circle_radii, distances_from_center)
+    O = _as_points(circle_centers, n)
+    radii = np.broadcast_to(np.asarray(circle_radii, dtype=float), (n,))
+    distances = np.broadcast_to(np.asarray(distances_from_center, dtype=float), (n,))
+    with np.errstate(invalid='ignore'):
+        half_lengths = np.where(np.abs(distances) < radii, np.sqrt(radii**2 - distances**2), np.nan)
+
+    chords = np.empty((n, 2, 3))
+    chords[:, 0, 0] = O[:, 0] - half_lengths
+    chords[:, 1, 0] = O[:, 0] + half_lengths
+    chords[:, :, 1] = (O[:, 1] + distances)[:, None]
+    chords[:, :, 2] = O[:, 2:3]
+    chords[np.isnan(half_lengths)] = np.nan
+    return chords
+
+def get_chord_from_length_batch(circle_centers, circle_radii, chord_lengths) -> np.ndarray:
+    """Batched get_chord_from_length: returns (N, 2, 3), NaN where the chord is longer than the diameter."""
+    radii = np.asarray(circle_radii, dtype=float)
+    half_lengths = np.asarray(chord_lengths, dtype=float) / 2
+    with np.errstate(invalid='ignore'):
+        distances = np.where(half_lengths <= radii, np.sqrt(radii**2 - half_lengths**2), np.nan)
+    return get_chord_from_center_distance_batch(circle_centers, circle_radii, distances)
+
+# Vectorized counterparts of HELPER_FUNCTIONS, taking one array per positional argument
+BATCH_KERNELS = {
+    "get_square_vertices": get_square_vertices_batch,
+    "get_rectangle_vertices": get_rectangle_vertices_batch,
+    "get_equilateral_triangle_vertices": get_equilateral_triangle_vertices_batch,
+    "get_isosceles_triangle_vertices": get_isosceles_triangle_vertices_batch,
+    "get_right_triangle_vertices": get_right_triangle_vertices_batch,
+    "get_tangent_by_point": get_tangent_by_point_batch,
+    "get_tangent_by_distance_from_center": get_tangent_by_distance_from_center_batch,
+    "get_tangent_by_length_of_tangent": get_tangent_by_length_of_tangent_batch,
+    "get_tangent_by_angle_between_tangents": get_tangent_by_angle_between_tangents_batch,
+    "get_tangent_by_angle_with_radius": get_tangent_by_angle_with_radius_batch,
+    "get_chord_from_center_distance": get_chord_from_center_distance_batch,
+    "get_chord_from_length": get_chord_from_length_batch,
+}
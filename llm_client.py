@@ -0,0 +1,178 @@
+import json
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://api.groq.com/openai/v1"
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Groq/OpenAI style rate limit headers, mapped to the keys parse_rate_limit_headers() returns
+RATE_LIMIT_HEADERS = {
+    "x-ratelimit-limit-requests": "limit_requests",
+    "x-ratelimit-remaining-requests": "remaining_requests",
+    "x-ratelimit-reset-requests": "reset_requests",
+    "x-ratelimit-limit-tokens": "limit_tokens",
+    "x-ratelimit-remaining-tokens": "remaining_tokens",
+    "x-ratelimit-reset-tokens": "reset_tokens",
+}
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+class LLMClient:
+    """Keep-alive client for an OpenAI-compatible chat completions endpoint.
+
+    Requests share a pooled session, use separate connect/read timeouts and
+    are retried with jittered exponential backoff on connection errors and
+    retryable status codes, honoring the server's Retry-After header.
+    Callables in rate_limit_listeners are called with the parsed rate limit
+    headers and status code of every response, retries included.
+    """
+
+    def __init__(self, base_url: str, api_key: str, connect_timeout: float = 10.0, read_timeout: float = 120.0,
+                 max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 30.0, pool_size: int = 16):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limit_listeners: List[Callable[[Dict[str, Any], int], None]] = []
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    @property
+    def chat_url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def retry_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """POST a chat completion payload, retrying transient failures."""
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.session.post(self.chat_url, json=payload, timeout=self.timeout, stream=stream)
+                if self.rate_limit_listeners:
+                    rate_limits = parse_rate_limit_headers(response.headers)
+                    for listener in self.rate_limit_listeners:
+                        listener(rate_limits, response.status_code)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                if attempt >= self.max_retries:
+                    response.raise_for_status()
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            time.sleep(self.retry_delay(attempt, response))
+            attempt += 1
+
+    def chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a non-streaming chat completion and return the decoded JSON body."""
+        return self.post(payload).json()
+
+    def stream_chat(self, payload: Dict[str, Any]) -> Iterator[str]:
+        """Send a streaming chat completion and yield content deltas as they arrive.
+
+        Closing the generator early closes the connection, which stops the
+        server from generating (and billing) the remaining tokens.
+        """
+        response = self.post({**payload, "stream": True}, stream=True)
+        try:
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                choices = chunk.get("choices") or []
+                if choices:
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            response.close()
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse reset durations such as "2m59.56s", "7.66s" or "120ms" into seconds."""
+    parts = DURATION_PART.findall(value or "")
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+def parse_rate_limit_headers(headers) -> Dict[str, Any]:
+    """Rate limit counters (ints) and reset times (seconds) present in a response's headers."""
+    rate_limits = {}
+    for header, key in RATE_LIMIT_HEADERS.items():
+        value = headers.get(header)
+        if value is None:
+            continue
+        if key.startswith("reset"):
+            seconds = parse_duration(value)
+            if seconds is not None:
+                rate_limits[key] = seconds
+        else:
+            try:
+                rate_limits[key] = int(float(value))
+            except ValueError:
+                pass
+    retry_after = parse_retry_after(headers.get("Retry-After"))
+    if retry_after is not None:
+        rate_limits["retry_after"] = retry_after
+    return rate_limits
+
+_clients: Dict[Tuple[str, str, float, float, int], LLMClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(config: Dict[str, Any]) -> LLMClient:
+    """Return the shared client for the base URL, key and timeout/retry settings in an API config."""
+    connect_timeout = config.get("connect_timeout", 10.0)
+    read_timeout = config.get("read_timeout", 120.0)
+    max_retries = config.get("max_retries", 4)
+    key = (config["base_url"], config["api_key"], connect_timeout, read_timeout, max_retries)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = LLMClient(
+                config["base_url"],
+                config["api_key"],
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                max_retries=max_retries
+            )
+        return _clients[key]
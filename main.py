@@ -1,193 +1,416 @@
 import json
 import re
 import os
+import time
+from string import Template
 from dotenv import load_dotenv
-import requests
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from cache import DiskCache, make_cache_key
+from few_shot_index import FewShotIndex, FewShotSelection, estimate_tokens
+from llm_client import DEFAULT_BASE_URL, get_client
+from tracing import span
+from schema_validator import arity_table, function_catalog, validate_schema
+from template_cache import template_cache
+from fast_path import fast_path_stats, parse_prompt
 
 load_dotenv()
 
-def get_api_config(model_name: str = "qwen-qwq-32b") -> Dict[str, str]:
-    """Get API configuration including API key and URL."""
+def get_api_config(model_name: str = "qwen-qwq-32b") -> Dict[str, Any]:
+    """Get API configuration including API key, URL and HTTP client settings.
+
+    Set LLM_BASE_URL to target any OpenAI-compatible endpoint instead of Groq.
+    """
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("GROQ_API_KEY environment variable not set")
     
+    base_url = os.getenv("LLM_BASE_URL", DEFAULT_BASE_URL).rstrip('/')
     return {
         "model_name": model_name,
         "api_key": api_key,
-        "api_url": "https://api.groq.com/openai/v1/chat/completions"
+        "base_url": base_url,
+        "api_url": f"{base_url}/chat/completions",
+        "connect_timeout": float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+        "read_timeout": float(os.getenv("LLM_READ_TIMEOUT", "120")),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", "4"))
     }
 
-def get_few_shot_examples(description: str) -> str:
-    """Get few shot examples for the description."""
+FEW_SHOT_KEYWORDS = [
+    ("circle", "few_shot_examples/circle.txt"),
+    ("square", "few_shot_examples/square.txt"),
+    ("rectangle", "few_shot_examples/rectangle.txt"),
+    ("triangle", "few_shot_examples/triangle.txt"),
+    ("tangent", "few_shot_examples/tangent.txt"),
+    ("inscribe", "few_shot_examples/inscribe.txt"),
+    ("circumscribe", "few_shot_examples/circumscribe.txt"),
+    ("chord", "few_shot_examples/chord.txt"),
+    ("semi", "few_shot_examples/semicircle.txt"),
+    ("concentric", "few_shot_examples/concentric.txt"),
+]
+
+SAMPLING_PARAMS = {
+    "temperature": 0.3,
+    "max_tokens": 10000,
+    "top_p": 0.9
+}
+
+FEW_SHOT_TOKEN_BUDGET = int(os.getenv("FEW_SHOT_TOKEN_BUDGET", "2000"))
+
+# Follow-ups sent with only the validation errors before a schema is given up on
+MAX_SCHEMA_REASKS = int(os.getenv("MAX_SCHEMA_REASKS", "1"))
+
+response_cache = DiskCache(os.getenv("SCENE_CACHE_DIR", ".scene_cache"))
 
-    few_shot_examples = ""
+few_shot_index = FewShotIndex.from_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "few_shot_examples"))
 
+def get_keyword_few_shot_files(description: str) -> List[str]:
+    """Get the few shot files the original keyword scan would include (used as the savings baseline)."""
     description = description.lower()
+    return [path for keyword, path in FEW_SHOT_KEYWORDS if keyword in description]
 
-    if "circle" in description:
-        with open('few_shot_examples/circle.txt', 'r') as f:
-            few_shot_examples += f.read()
+def select_few_shot_examples(description: str) -> FewShotSelection:
+    """Select the best-matching few shot examples for the description within the token budget."""
+    return few_shot_index.select(
+        description,
+        token_budget=FEW_SHOT_TOKEN_BUDGET,
+        baseline_files=[os.path.join(os.path.dirname(os.path.abspath(__file__)), path) for path in get_keyword_few_shot_files(description)]
+    )
 
-    if "square" in description:
-        with open('few_shot_examples/square.txt', 'r') as f:
-            few_shot_examples += f.read()
+def get_few_shot_examples(description: str) -> str:
+    """Get few shot examples for the description."""
+    return select_few_shot_examples(description).text
 
-    if "rectangle" in description:
-        with open('few_shot_examples/rectangle.txt', 'r') as f:
-            few_shot_examples += f.read()
+# The system prompt (rules plus the function catalog) is built once and sent
+# unchanged on every request so provider-side prefix caching can hit; the
+# per-question few-shot examples and the question follow in later messages.
+SYSTEM_PROMPT = """You are a geometric parser with expert knowledge of geometric principles. Use Chain of Thought to analyze the geometric problem and convert it into a JSON schema.
+Your task is to extract all information about the image from the question. You are NOT required to SOLVE the question.
 
-    if "triangle" in description:
-        with open('few_shot_examples/triangle.txt', 'r') as f:
-            few_shot_examples += f.read()
+CRITICAL RULES FOR JSON STRUCTURE:
+1. All numeric values must be plain numbers (e.g., 5 not "5")
+2. All coordinates must be arrays of numbers (e.g., [0, 0, 0] not "[0, 0, 0]")
+3. Function calls must be strings (e.g., "get_square_vertices([0, 0, 0], 5, 0)")
+4. Do not add any explanatory text after the JSON
+5. The JSON must be valid and complete
+6. Do NOT use BLACK color for any shape
+7. For derived calculations:
+    - Square inscribed in circle: side = radius * sqrt(2)
+    - Circle inscribed in square: radius = side / 2
+    - Semicircle on line: center = midpoint of line, radius = line_length / 2
+8. All entity IDs must be unique
+9. Function call arguments may use arithmetic (+, -, *, /), sqrt(), pi and nested function calls (e.g., "get_square_vertices([0, 0, 0], 3 * sqrt(2), 0)") - prefer this over rounding derived values by hand
+10. Positions may refer to other entities' positions as ID.field instead of repeating numbers (e.g., "get_square_vertices(C1.center, C1.radius * sqrt(2), 0)" or "[T1.endpoints[1], C1.center]")
 
-    if "tangent" in description:
-        with open('few_shot_examples/tangent.txt', 'r') as f:
-            few_shot_examples += f.read()
+NEVER put geometric properties (radius, side_length, etc.) only in entities - they MUST be in positions section for manim code generation.
 
-    if "inscribe" in description:
-        with open('few_shot_examples/inscribe.txt', 'r') as f:
-            few_shot_examples += f.read()
+AVAILABLE GEOMETRIC FUNCTIONS:
+""" + function_catalog() + """
 
-    if "circumscribe" in description:
-        with open('few_shot_examples/circumscribe.txt', 'r') as f:
-            few_shot_examples += f.read()
+IMPORTANT: The number of positional arguments for each function is as follows:
+""" + arity_table()
 
-    if "chord" in description:
-        with open('few_shot_examples/chord.txt', 'r') as f:
-            few_shot_examples += f.read()
+FEW_SHOT_TEMPLATE = Template("""Here are worked examples of questions and their JSON schemas:
 
-    if "semi" in description:
-        with open('few_shot_examples/semicircle.txt', 'r') as f:
-            few_shot_examples += f.read()
+$few_shot_examples""")
 
-    if "concentric" in description:
-        with open('few_shot_examples/concentric.txt', 'r') as f:
-            few_shot_examples += f.read()
+QUESTION_TEMPLATE = Template("""Now, analyze this input and generate a JSON schema for: $description
+First provide your Chain of Thought analysis, then output the JSON schema starting with the line "JSON Output:" followed by the JSON on a new line. Do not add any explanatory text after the JSON.""")
 
-    return few_shot_examples
+REASK_TEMPLATE = Template("""Your JSON schema has these problems:
+$problems
+Fix them and output the complete corrected JSON schema, starting with the line "JSON Output:" followed by the JSON on a new line. Do not repeat the analysis.""")
 
-def generate_json_schema(description: str, model_name: str = "llama-3.1-8b-instant") -> Dict[str, Any]:
-    """Generate a JSON schema for the geometric description using Chain of Thought."""
-    # Get API configuration
-    config = get_api_config(model_name)
-    
+def build_messages(description: str, few_shot_examples: Optional[str] = None) -> List[Dict[str, str]]:
+    """Build the chat messages for the geometric description, fixed system prompt first."""
     # Sanitize input
     truncated_description = re.sub(r'[{}]', '', description).replace('\n', ' ').strip()
 
-    few_shot_examples = get_few_shot_examples(description)
-
-    prompt = """You are a geometric parser with expert knowledge of geometric principles. Use Chain of Thought to analyze the geometric problem and convert it into a JSON schema.
-    Your task is to extract all information about the image from the question. You are NOT required to SOLVE the question.
-
-    CRITICAL RULES FOR JSON STRUCTURE:
-    1. All numeric values must be plain numbers (e.g., 5 not "5")
-    2. All coordinates must be arrays of numbers (e.g., [0, 0, 0] not "[0, 0, 0]")
-    3. Function calls must be strings (e.g., "get_square_vertices([0, 0, 0], 5, 0)")
-    4. Do not add any explanatory text after the JSON
-    5. The JSON must be valid and complete
-    6. Do NOT use BLACK color for any shape
-    7. For derived calculations:
-        - Square inscribed in circle: side = radius * sqrt(2)
-        - Circle inscribed in square: radius = side / 2
-        - Semicircle on line: center = midpoint of line, radius = line_length / 2
-    8. All entity IDs must be unique
-
-    NEVER put geometric properties (radius, side_length, etc.) only in entities - they MUST be in positions section for manim code generation.
-
-    AVAILABLE GEOMETRIC FUNCTIONS:
-    1. get_square_vertices(center, side_length, orientation)
-    2. get_rectangle_vertices(center, length, width, orientation)
-    3. get_equilateral_triangle_vertices(center, side_length, orientation)
-    4. get_isosceles_triangle_vertices(center, equal_sides, base, orientation)
-    5. get_right_triangle_vertices(center, base, height, orientation)
-    6. get_inscribed_circle(vertices)
-    7. get_circumscribed_circle(vertices)
-    8. get_common_chord(circle1_center, circle1_radius, circle2_center, circle2_radius)
-    9. get_chord_from_center_distance(circle_center, circle_radius, distance_from_center)
-    10. get_chord_from_length(circle_center, circle_radius, chord_length)
-    11. get_tangent_by_point(circle_center, circle_radius, external_point)
-    12. get_tangent_by_angle_between_tangents(circle_center, circle_radius, angle)
-    13. get_tangent_by_angle_with_radius(circle_center, circle_radius, angle)
-    14. get_tangent_by_distance_from_center(circle_center, circle_radius, distance_from_center)
-    15. get_tangent_by_length_of_tangent(circle_center, circle_radius, length_of_tangent)
-
-    IMPORTANT: The number of positional arguments for each function is as follows:
-    1. get_square_vertices: 3
-    2. get_rectangle_vertices: 4
-    3. get_equilateral_triangle_vertices: 3
-    4. get_isosceles_triangle_vertices: 4
-    5. get_right_triangle_vertices: 4
-    6. get_inscribed_circle: 1
-    7. get_circumscribed_circle: 1
-    8. get_common_chord: 4
-    9. get_chord_from_center_distance: 3
-    10. get_chord_from_length: 3
-    11. get_tangent_by_point: 3
-    12. get_tangent_by_angle_between_tangents: 3
-    13. get_tangent_by_angle_with_radius: 3
-    14. get_tangent_by_distance_from_center: 3
-    15. get_tangent_by_length_of_tangent: 3
-
-    """ + few_shot_examples + """
-
-    Now, analyze this input and generate a JSON schema for: """ + truncated_description + """
-    First provide your Chain of Thought analysis, then output the JSON schema starting with the line "JSON Output:" followed by the JSON on a new line. Do not add any explanatory text after the JSON."""
-
-    headers = {
-        "Authorization": f"Bearer {config['api_key']}",
-        "Content-Type": "application/json"
+    if few_shot_examples is None:
+        few_shot_examples = get_few_shot_examples(description)
+
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if few_shot_examples:
+        messages.append({"role": "user", "content": FEW_SHOT_TEMPLATE.substitute(few_shot_examples=few_shot_examples)})
+    messages.append({"role": "user", "content": QUESTION_TEMPLATE.substitute(description=truncated_description)})
+    return messages
+
+def build_reask_messages(description: str, json_schema: Dict[str, Any], problems: List[str]) -> List[Dict[str, str]]:
+    """Messages asking the model to fix its schema: the question, its JSON and the problems, without few-shot examples."""
+    messages = build_messages(description, few_shot_examples="")
+    messages.append({"role": "assistant", "content": f"JSON Output:\n{json.dumps(json_schema)}"})
+    messages.append({"role": "user", "content": REASK_TEMPLATE.substitute(problems="\n".join(f"- {problem}" for problem in problems))})
+    return messages
+
+def reask_schema(config: Dict[str, Any], description: str, json_schema: Dict[str, Any],
+                 problems: List[str]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Send the schema problems back to the model and return its corrected schema and the tokens it cost."""
+    messages = build_reask_messages(description, json_schema, problems)
+    payload = {"model": config["model_name"], "messages": messages, **SAMPLING_PARAMS}
+    with span("llm_reask", model=config["model_name"], problems=len(problems)) as reask_span:
+        result = get_client(config).chat(payload)
+        reask_span.set(**usage_metrics(result))
+        if not result.get("choices"):
+            raise ValueError("Unexpected API response format")
+        output = result["choices"][0]["message"]["content"].strip()
+    return extract_json_schema(output, verbose=False), {
+        "prompt_tokens": sum(estimate_tokens(message["content"]) for message in messages),
+        "completion_tokens": estimate_tokens(output)
+    }
+
+def extract_json_schema(output: str, verbose: bool = True) -> Dict[str, Any]:
+    """Extract the JSON schema following the "JSON Output:" marker in a completion."""
+    json_marker = "JSON Output:"
+    if json_marker not in output:
+        raise ValueError("No JSON output marker found in response")
+    
+    # Split at JSON marker and take everything after it
+    json_text = output.split(json_marker)[1].strip()
+    
+    if verbose:
+        # Print Chain of Thought analysis
+        cot_analysis = output.split(json_marker)[0].strip()
+        print("Chain of Thought Analysis:")
+        print(cot_analysis)
+        print("\nGenerated JSON Schema:")
+    
+    try:
+        # Try to find the JSON object boundaries
+        json_start = json_text.find('{')
+        json_end = json_text.rfind('}') + 1
+        if json_start == -1 or json_end <= json_start:
+            raise ValueError("No valid JSON object found in the text")
+        
+        clean_json = json_text[json_start:json_end]
+        return json.loads(clean_json)
+    except json.JSONDecodeError as e:
+        print(f"Failed to parse JSON: {json_text}")
+        raise ValueError(f"Invalid JSON format: {str(e)}")
+
+class StreamingJSONExtractor:
+    """Incrementally find the JSON object after the "JSON Output:" marker in a token stream.
+
+    Text is fed chunk by chunk; once the marker has been seen, braces are
+    counted (ignoring those inside strings) and feed() returns True as soon as
+    the top-level object closes.
+    """
+
+    def __init__(self, json_marker: str = "JSON Output:"):
+        self.json_marker = json_marker
+        self.text = ""
+        self.marker_end = -1
+        self.json_start = -1
+        self.json_end = -1
+        self._scan_pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> bool:
+        """Append a chunk of completion text. Returns True once the JSON object is complete."""
+        if self.json_end != -1:
+            return True
+        self.text += chunk
+
+        if self.marker_end == -1:
+            # The marker may be split across chunks, so search the overlap too
+            search_from = max(0, len(self.text) - len(chunk) - len(self.json_marker))
+            marker_pos = self.text.find(self.json_marker, search_from)
+            if marker_pos == -1:
+                return False
+            self.marker_end = marker_pos + len(self.json_marker)
+            self._scan_pos = self.marker_end
+
+        text = self.text
+        for pos in range(self._scan_pos, len(text)):
+            char = text[pos]
+            if self.json_start == -1:
+                if char == '{':
+                    self.json_start = pos
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self.json_end = pos + 1
+                    return True
+        self._scan_pos = len(text)
+        return False
+
+    @property
+    def complete(self) -> bool:
+        return self.json_end != -1
+
+    def output(self) -> str:
+        """Completion text up to the end of the JSON object, or everything received so far."""
+        return self.text[:self.json_end] if self.complete else self.text
+
+def stream_completion(config: Dict[str, Any], payload: Dict[str, Any], metrics: Optional[Dict[str, Any]] = None) -> str:
+    """Stream a completion and stop reading as soon as the JSON object after the marker closes."""
+    extractor = StreamingJSONExtractor()
+    start = time.perf_counter()
+    first_token_seconds = None
+
+    stream = get_client(config).stream_chat(payload)
+    try:
+        for chunk in stream:
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start
+            if extractor.feed(chunk):
+                break
+    finally:
+        # Closing the stream drops the connection so no trailing tokens are generated
+        stream.close()
+
+    if metrics is not None:
+        metrics.update({
+            "first_token_seconds": first_token_seconds,
+            "total_seconds": time.perf_counter() - start,
+            "completion_chars": len(extractor.text),
+            "early_stop": extractor.complete
+        })
+    return extractor.output()
+
+def usage_metrics(result: Dict[str, Any]) -> Dict[str, int]:
+    """Prompt/completion token counts from a completion's usage field, split into cached and uncached prompt tokens."""
+    usage = result.get("usage") or {}
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "cached_prompt_tokens": cached_tokens,
+        "uncached_prompt_tokens": prompt_tokens - cached_tokens,
+        "completion_tokens": usage.get("completion_tokens", 0)
     }
+
+def generate_json_schema(description: str, model_name: str = "llama-3.1-8b-instant", verbose: bool = True,
+                         use_cache: bool = True, stream: bool = False, metrics: Optional[Dict[str, Any]] = None,
+                         use_fast_path: bool = True) -> Dict[str, Any]:
+    """Generate a JSON schema for the geometric description using Chain of Thought.
+
+    Prompts matching one of the fast_path rules are parsed locally without
+    an LLM call unless use_fast_path is False. Parsed schemas are cached on disk keyed on the model, messages, few-shot
+    sections and sampling params. On a miss, a schema cached for a question
+    differing only in numbers and point names is filled with this question's
+    values (see template_cache). Pass use_cache=False to always call the API.
+    With stream=True the completion is streamed and cut off once the JSON
+    object closes. The extracted schema is checked by schema_validator; if it
+    has problems, up to MAX_SCHEMA_REASKS short follow-ups listing just those
+    problems are sent, and a ValueError is raised if it is still invalid.
+    Few-shot token counts, API token usage (including cached prompt tokens),
+    stream timing and re-ask counts are written into `metrics` if a dict is given.
+    """
+    if use_fast_path:
+        start = time.perf_counter()
+        with span("fast_path") as fast_path_span:
+            parsed = parse_prompt(description)
+            fast_path_span.set(rule=parsed[0] if parsed else None)
+        fast_path_stats.record(parsed[0] if parsed else None, time.perf_counter() - start)
+        if parsed is not None:
+            if verbose:
+                print(f"Parsed locally by the {parsed[0]} rule")
+            if metrics is not None:
+                metrics["fast_path"] = parsed[0]
+            return parsed[1]
+
+    # Get API configuration
+    config = get_api_config(model_name)
     
+    with span("few_shot_selection") as selection_span:
+        few_shot = select_few_shot_examples(description)
+        messages = build_messages(description, few_shot.text)
+        selection_span.set(sections=few_shot.section_ids, few_shot_tokens=few_shot.tokens)
+    if metrics is not None:
+        metrics.update({"few_shot_tokens": few_shot.tokens, "few_shot_tokens_saved": few_shot.tokens_saved})
+    if verbose:
+        print(f"Few-shot examples: {', '.join(few_shot.section_ids) or 'none'} (~{few_shot.tokens} tokens, ~{few_shot.tokens_saved} saved vs keyword scan)")
+
+    cache_key = make_cache_key(config["base_url"], config["model_name"], messages, few_shot.section_ids, SAMPLING_PARAMS)
+    # Templates are shared across questions, so they are keyed on the prompt around the question instead
+    template_context = [config["base_url"], config["model_name"], SYSTEM_PROMPT, few_shot.text, SAMPLING_PARAMS]
+    if use_cache:
+        cached_schema = response_cache.get(cache_key)
+        if cached_schema is not None:
+            if verbose:
+                print("Using cached JSON schema")
+            if metrics is not None:
+                metrics["cache_hit"] = True
+            return cached_schema
+        with span("template_lookup") as template_span:
+            templated_schema = template_cache.get(description, template_context)
+            template_span.set(hit=templated_schema is not None)
+        if templated_schema is not None:
+            if verbose:
+                print("Filled a cached schema template with this question's values")
+            if metrics is not None:
+                metrics.update({"cache_hit": True, "template_hit": True})
+            return templated_schema
+
     payload = {
         "model": config["model_name"],
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 10000,
-        "top_p": 0.9
+        "messages": messages,
+        **SAMPLING_PARAMS
     }
 
     try:
-        response = requests.post(config["api_url"], headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            output = result["choices"][0]["message"]["content"].strip()
-            
-            # Extract JSON part
-            json_marker = "JSON Output:"
-            if json_marker not in output:
-                raise ValueError("No JSON output marker found in response")
-            
-            # Split at JSON marker and take everything after it
-            json_text = output.split(json_marker)[1].strip()
-            
-            # Print Chain of Thought analysis
-            cot_analysis = output.split(json_marker)[0].strip()
-            print("Chain of Thought Analysis:")
-            print(cot_analysis)
-            print("\nGenerated JSON Schema:")
-            
-            try:
-                # Try to find the JSON object boundaries
-                json_start = json_text.find('{')
-                json_end = json_text.rfind('}') + 1
-                if json_start == -1 or json_end <= json_start:
-                    raise ValueError("No valid JSON object found in the text")
-                
-                clean_json = json_text[json_start:json_end]
-                json_schema = json.loads(clean_json)
-                
-                return json_schema
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON: {json_text}")
-                raise ValueError(f"Invalid JSON format: {str(e)}")
-        else:
-            raise ValueError("Unexpected API response format")
+        with span("llm_request", model=config["model_name"], stream=stream) as llm_span:
+            if stream:
+                stream_metrics = metrics if metrics is not None else {}
+                output = stream_completion(config, payload, stream_metrics).strip()
+                # Streamed responses carry no usage field, so token counts are estimates
+                llm_span.set(first_token_seconds=stream_metrics["first_token_seconds"], tokens_estimated=True,
+                             prompt_tokens=sum(estimate_tokens(message["content"]) for message in messages),
+                             completion_tokens=estimate_tokens(output))
+                if verbose and stream_metrics["first_token_seconds"] is not None:
+                    print(f"First token after {stream_metrics['first_token_seconds']:.2f}s, stream closed after {stream_metrics['total_seconds']:.2f}s")
+            else:
+                result = get_client(config).chat(payload)
+                usage = usage_metrics(result)
+                llm_span.set(**usage)
+                if metrics is not None:
+                    metrics.update(usage)
+                if not result.get("choices"):
+                    raise ValueError("Unexpected API response format")
+                output = result["choices"][0]["message"]["content"].strip()
+
+        with span("json_extraction"):
+            json_schema = extract_json_schema(output, verbose)
+        with span("schema_validation") as validation_span:
+            problems = validate_schema(json_schema)
+            validation_span.set(problems=len(problems))
+
+        # A full retry would resend the few-shot prompt and regenerate the chain of thought
+        full_retry_tokens = sum(estimate_tokens(message["content"]) for message in messages) + estimate_tokens(output)
+        reasks = 0
+        reask_tokens_used = 0
+        reask_tokens_saved = 0
+        while problems and reasks < MAX_SCHEMA_REASKS:
+            reasks += 1
+            if verbose:
+                print(f"Schema has {len(problems)} problem(s), asking the model to fix them: {'; '.join(problems)}")
+            json_schema, reask_tokens = reask_schema(config, description, json_schema, problems)
+            reask_tokens_used += reask_tokens["prompt_tokens"] + reask_tokens["completion_tokens"]
+            reask_tokens_saved += full_retry_tokens - reask_tokens["prompt_tokens"] - reask_tokens["completion_tokens"]
+            problems = validate_schema(json_schema)
+        if metrics is not None:
+            metrics.update({"schema_reasks": reasks, "reask_tokens": reask_tokens_used,
+                            "reask_tokens_saved": reask_tokens_saved})
+        if problems:
+            raise ValueError(f"Schema validation failed: {'; '.join(problems)}")
+        if use_cache:
+            response_cache.put(cache_key, json_schema)
+            template_cache.put(description, template_context, json_schema)
+        return json_schema
             
     except Exception as e:
         raise ValueError(f"Failed to generate JSON schema: {str(e)}")
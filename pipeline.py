@@ -0,0 +1,134 @@
+import argparse
+import copy
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+from main import generate_json_schema
+from cascade import DEFAULT_TIERS, cascade_stats, generate_with_cascade
+from compute_position import evaluate_function_calls
+from generate_code import generate_scene_code
+import tracing
+
+def run_pipeline(question: str, model_name: str = "llama-3.1-8b-instant", output_dir: Optional[str] = None,
+                 render: bool = True, quality: str = "low_quality", preview: bool = False,
+                 class_name: str = "GeneratedScene", verbose: bool = True,
+                 export_source: bool = False, use_render_cache: bool = True,
+                 cascade_tiers: Optional[List[str]] = None, keep_units: bool = False) -> Dict[str, Any]:
+    """Run parse -> evaluate_function_calls -> render in one process.
+
+    Stages hand data to each other in memory and the evaluated scene is
+    rendered directly, without generating and importing scene code. Intermediate
+    files (current_scene.json, current_scene_final.json) are only written when
+    output_dir is given, and renders go to output_dir/media (without
+    output_dir, to a new media/run_* directory per call, so concurrent runs do
+    not overwrite each other's files). export_source also
+    generates the equivalent manim source (generated_scene.py) for debugging.
+    Previously rendered scenes are served from the render cache unless
+    use_render_cache is False. With cascade_tiers the question is parsed by
+    the model cascade (cheapest tier first) instead of model_name alone.
+    The evaluated scene is fitted to the frame; keep_units leaves entity and
+    relationship measurements in the question's units. With tracing enabled
+    each stage is recorded as a span under one "pipeline" span.
+    """
+    with tracing.span("pipeline", model=model_name, render=render):
+        timings = {}
+
+        start = time.perf_counter()
+        with tracing.span("parse") as parse_span:
+            if cascade_tiers:
+                metrics = {}
+                json_schema = generate_with_cascade(question, cascade_tiers, verbose=verbose, metrics=metrics)
+                parse_span.set(tier=metrics["tier"])
+            else:
+                json_schema = generate_json_schema(question, model_name, verbose=verbose)
+        timings["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        final_schema = evaluate_function_calls(copy.deepcopy(json_schema), keep_units=keep_units)
+        timings["evaluate"] = time.perf_counter() - start
+
+        code = None
+        if export_source:
+            start = time.perf_counter()
+            code = generate_scene_code(final_schema, class_name)
+            timings["codegen"] = time.perf_counter() - start
+
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            with open(os.path.join(output_dir, 'current_scene.json'), 'w') as f:
+                json.dump(json_schema, f, indent=2)
+            with open(os.path.join(output_dir, 'current_scene_final.json'), 'w') as f:
+                json.dump(final_schema, f, indent=2)
+            if code is not None:
+                with open(os.path.join(output_dir, 'generated_scene.py'), 'w') as f:
+                    f.write(code)
+
+        image_path = None
+        if render:
+            from scene_renderer import render_scene
+
+            start = time.perf_counter()
+            if output_dir is not None:
+                media_dir = os.path.join(output_dir, "media")
+            else:
+                os.makedirs("media", exist_ok=True)
+                media_dir = tempfile.mkdtemp(prefix="run_", dir="media")
+            image_path = render_scene(final_schema, media_dir, quality, class_name, preview, use_render_cache)
+            timings["render"] = time.perf_counter() - start
+
+        return {
+            "json_schema": json_schema,
+            "final_schema": final_schema,
+            "code": code,
+            "image_path": image_path,
+            "timings": timings
+        }
+
+def main():
+    """Command line entry point running the whole pipeline for one question."""
+    parser = argparse.ArgumentParser(description="Turn a geometry question into a rendered manim scene in one process.")
+    parser.add_argument("question", nargs="?", help="question text (defaults to the first line of prompt.txt)")
+    parser.add_argument("--model", default="llama-3.1-8b-instant", help="model name passed to generate_json_schema")
+    parser.add_argument("--cascade", action="store_true",
+                        help="try the cheapest model in $CASCADE_MODELS first, escalating only on invalid schemas")
+    parser.add_argument("--output-dir", help="write intermediate files and media here")
+    parser.add_argument("--no-render", action="store_true", help="stop after evaluating positions")
+    parser.add_argument("--quality", default="low_quality", help="manim quality preset")
+    parser.add_argument("--preview", action="store_true", help="open the rendered image when done")
+    parser.add_argument("--export-source", action="store_true", help="also generate the equivalent manim source for debugging")
+    parser.add_argument("--no-render-cache", action="store_true", help="always render, bypassing the render cache")
+    parser.add_argument("--keep-units", action="store_true",
+                        help="keep entity and relationship measurements in the question's units when fitting the scene")
+    parser.add_argument("--trace-dir", help="write span traces and Prometheus metrics here (default: $TRACE_DIR)")
+    args = parser.parse_args()
+    if args.trace_dir:
+        tracing.configure(args.trace_dir)
+
+    question = args.question
+    if question is None:
+        with open('prompt.txt', 'r') as f:
+            question = f.readline()
+
+    print(f"\nProcessing question: {question}")
+    try:
+        result = run_pipeline(question, args.model, args.output_dir, not args.no_render, args.quality, args.preview,
+                              export_source=args.export_source, use_render_cache=not args.no_render_cache,
+                              cascade_tiers=DEFAULT_TIERS if args.cascade else None, keep_units=args.keep_units)
+    except Exception as e:
+        print(f"Error: {e}")
+        return
+
+    print(json.dumps(result["final_schema"], indent=2))
+    if result["image_path"]:
+        print(f"Rendered image: {result['image_path']}")
+        from scene_renderer import print_render_cache_stats
+        print_render_cache_stats()
+    if args.cascade:
+        print(cascade_stats.report())
+    print("Stage timings: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["timings"].items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import copy
+import html
+import json
+import os
+import time
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from compute_position import evaluate_function_calls
+from generate_code import POLYGON_TYPES, semicircle_geometry
+from render_pool import collect_scene_files
+
+# manim's default frame (16:9, eight units high) and background
+FRAME_WIDTH = 8.0 * 16 / 9
+FRAME_HEIGHT = 8.0
+BACKGROUND = "#000000"
+
+# manim's named colors, so previews match the rendered scene
+COLORS = {
+    "WHITE": "#FFFFFF", "BLACK": "#000000", "GRAY": "#888888", "GREY": "#888888",
+    "BLUE": "#58C4DD", "TEAL": "#5CD0B3", "GREEN": "#83C167", "YELLOW": "#FFFF00",
+    "GOLD": "#F0AC5F", "RED": "#FC6255", "MAROON": "#C55F73", "PURPLE": "#9A72AC",
+    "PINK": "#D147BD", "ORANGE": "#FF862F",
+}
+
+# Points along a semicircle's arc when it is drawn as a polygon
+ARC_SEGMENTS = 48
+
+def resolve_color(name: str) -> str:
+    """Hex color for a color name from the JSON, passing hex strings through."""
+    return COLORS.get(str(name).upper(), name if str(name).startswith("#") else COLORS["WHITE"])
+
+def scene_shapes(scene_data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Flat drawing primitives for an evaluated scene, mirroring build_mobjects in scene_renderer.
+
+    Returns (shapes, problems); an entity whose position did not evaluate to
+    numbers is skipped and reported instead of drawn.
+    """
+    entities = {entity["id"]: entity for entity in scene_data["entities"]}
+    shapes: List[Dict[str, Any]] = []
+    problems = []
+
+    for entity_id, pos in scene_data["positions"].items():
+        entity_info = entities.get(entity_id, {})
+        entity_type = entity_info.get("type")
+        color = resolve_color(entity_info.get("color", "WHITE"))
+        try:
+            if entity_type == "circle":
+                center = np.array((pos["center"] or [0, 0, 0])[:2], dtype=float)
+                shapes.append({"kind": "circle", "center": center, "radius": float(pos["radius"]), "color": color, "fill": 0.3})
+                shapes.append({"kind": "dot", "center": center, "color": COLORS["WHITE"]})
+                shapes.append({"kind": "text", "at": center, "text": "O"})
+
+            elif entity_type == "semicircle":
+                center = pos["center"] or [0, 0, 0]
+                radius = float(pos["radius"])
+                start_angle, _, _ = semicircle_geometry(center, radius, entity_info.get("orientation", "up"))
+                angles = start_angle + np.linspace(0, np.pi, ARC_SEGMENTS + 1)
+                points = np.column_stack([center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)])
+                # Closing the arc draws the diameter
+                shapes.append({"kind": "polygon", "points": points, "color": color, "fill": 0.3})
+
+            elif entity_type in POLYGON_TYPES:
+                points = np.array(pos["vertices"], dtype=float)[:, :2]
+                shapes.append({"kind": "polygon", "points": points, "color": color, "fill": 0.3})
+
+            elif entity_type == "point":
+                center = np.array(pos["coordinates"], dtype=float)[:2]
+                shapes.append({"kind": "dot", "center": center, "color": color})
+                shapes.append({"kind": "text", "at": center, "text": entity_id})
+
+            elif entity_type == "line":
+                points = np.array(pos["endpoints"], dtype=float)[:, :2]
+                shapes.append({"kind": "line", "points": points, "color": color})
+
+            else:
+                problems.append(f"{entity_id}: entity type {entity_type!r} is not drawn")
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            problems.append(f"{entity_id}: position did not evaluate ({e})")
+
+    return shapes, problems
+
+def _to_pixels(points: np.ndarray, scale: float) -> np.ndarray:
+    """Scene coordinates (origin at the center, y up) to image coordinates (origin top left, y down)."""
+    points = np.atleast_2d(points)
+    return np.column_stack([(points[:, 0] + FRAME_WIDTH / 2) * scale, (FRAME_HEIGHT / 2 - points[:, 1]) * scale])
+
+def to_svg(shapes: List[Dict[str, Any]], width: int = 640) -> str:
+    """SVG document drawing the shapes over manim's frame."""
+    scale = width / FRAME_WIDTH
+    height = round(FRAME_HEIGHT * scale)
+    dot_radius = 0.08 * scale
+    elements = [f'<rect width="100%" height="100%" fill="{BACKGROUND}"/>']
+    for shape in shapes:
+        kind = shape["kind"]
+        if kind == "circle":
+            x, y = _to_pixels(shape["center"], scale)[0]
+            elements.append(f'<circle cx="{x:.2f}" cy="{y:.2f}" r="{shape["radius"] * scale:.2f}" stroke="{shape["color"]}" '
+                            f'stroke-width="2" fill="{shape["color"]}" fill-opacity="{shape["fill"]}"/>')
+        elif kind == "polygon":
+            points = " ".join(f"{x:.2f},{y:.2f}" for x, y in _to_pixels(shape["points"], scale))
+            elements.append(f'<polygon points="{points}" stroke="{shape["color"]}" stroke-width="2" '
+                            f'fill="{shape["color"]}" fill-opacity="{shape["fill"]}"/>')
+        elif kind == "line":
+            (x1, y1), (x2, y2) = _to_pixels(shape["points"], scale)[:2]
+            elements.append(f'<line x1="{x1:.2f}" y1="{y1:.2f}" x2="{x2:.2f}" y2="{y2:.2f}" '
+                            f'stroke="{shape["color"]}" stroke-width="2"/>')
+        elif kind == "dot":
+            x, y = _to_pixels(shape["center"], scale)[0]
+            elements.append(f'<circle cx="{x:.2f}" cy="{y:.2f}" r="{dot_radius:.2f}" fill="{shape["color"]}"/>')
+        elif kind == "text":
+            x, y = _to_pixels(shape["at"], scale)[0]
+            elements.append(f'<text x="{x + 2 * dot_radius:.2f}" y="{y:.2f}" fill="#FFFFFF" font-size="{0.3 * scale:.1f}" '
+                            f'font-family="sans-serif" dominant-baseline="middle">{html.escape(shape["text"])}</text>')
+    body = "\n  ".join(elements)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n  {body}\n</svg>\n')
+
+def _rgba(color: str, alpha: float = 1.0) -> Tuple[int, int, int, int]:
+    color = color.lstrip("#")
+    return (int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16), round(alpha * 255))
+
+def write_png(shapes: List[Dict[str, Any]], path: str, width: int = 320):
+    """Rasterize the shapes with Pillow (installed with manim); translucent fills are composited per shape."""
+    from PIL import Image, ImageDraw
+
+    scale = width / FRAME_WIDTH
+    size = (width, round(FRAME_HEIGHT * scale))
+    image = Image.new("RGBA", size, _rgba(BACKGROUND))
+    dot_radius = max(1.5, 0.08 * scale)
+    for shape in shapes:
+        kind = shape["kind"]
+        if shape.get("fill"):
+            # Draw filled shapes on their own layer so the fill opacity blends with what is below
+            layer = Image.new("RGBA", size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(layer)
+        else:
+            layer = None
+            draw = ImageDraw.Draw(image)
+        if kind == "circle":
+            x, y = _to_pixels(shape["center"], scale)[0]
+            radius = shape["radius"] * scale
+            draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=_rgba(shape["color"], shape["fill"]),
+                         outline=_rgba(shape["color"]), width=2)
+        elif kind == "polygon":
+            points = [tuple(point) for point in _to_pixels(shape["points"], scale)]
+            draw.polygon(points, fill=_rgba(shape["color"], shape["fill"]), outline=_rgba(shape["color"]), width=2)
+        elif kind == "line":
+            draw.line([tuple(point) for point in _to_pixels(shape["points"], scale)[:2]], fill=_rgba(shape["color"]), width=2)
+        elif kind == "dot":
+            x, y = _to_pixels(shape["center"], scale)[0]
+            draw.ellipse([x - dot_radius, y - dot_radius, x + dot_radius, y + dot_radius], fill=_rgba(shape["color"]))
+        elif kind == "text":
+            x, y = _to_pixels(shape["at"], scale)[0]
+            # The default font is a small bitmap font, so center it on the point by hand
+            draw.text((x + 2 * dot_radius, y - 5), shape["text"], fill=_rgba("#FFFFFF"))
+        if layer is not None:
+            image = Image.alpha_composite(image, layer)
+    image.convert("RGB").save(path)
+
+def write_preview(scene_data: Dict[str, Any], output_prefix: str, png: bool = True,
+                  svg_width: int = 640, png_width: int = 320) -> Dict[str, Any]:
+    """Evaluate a scene if needed and write output_prefix.svg (and output_prefix.png unless png is False).
+
+    Returns the written paths, the entities that could not be drawn and the
+    seconds taken.
+    """
+    start = time.perf_counter()
+    final_scene = evaluate_function_calls(copy.deepcopy(scene_data))
+    shapes, problems = scene_shapes(final_scene)
+    result: Dict[str, Any] = {"svg": f"{output_prefix}.svg", "png": None, "problems": problems}
+    with open(result["svg"], 'w') as f:
+        f.write(to_svg(shapes, svg_width))
+    if png:
+        write_png(shapes, f"{output_prefix}.png", png_width)
+        result["png"] = f"{output_prefix}.png"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def main():
+    """Write SVG/PNG previews for scene JSON files without manim."""
+    parser = argparse.ArgumentParser(description="Write quick SVG and PNG previews of scene JSON files without manim.")
+    parser.add_argument("paths", nargs="*", default=["current_scene_final.json"],
+                        help="scene JSON files or directories of them (default current_scene_final.json)")
+    parser.add_argument("--output-dir", help="write previews here (default: next to each scene file)")
+    parser.add_argument("--no-png", action="store_true", help="only write SVG")
+    parser.add_argument("--width", type=int, default=320, help="PNG width in pixels")
+    args = parser.parse_args()
+
+    png = not args.no_png
+    if png:
+        try:
+            import PIL
+        except ImportError:
+            print("Pillow is not installed, writing SVG previews only")
+            png = False
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    scene_files = collect_scene_files(args.paths)
+    failed = 0
+    for file_path in scene_files:
+        with open(file_path, 'r') as f:
+            scene_data = json.load(f)
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        output_prefix = os.path.join(args.output_dir or os.path.dirname(file_path), f"{name}_preview")
+        result = write_preview(scene_data, output_prefix, png, png_width=args.width)
+        failed += bool(result["problems"])
+        print(f"[{name}] {result['png'] or result['svg']} in {result['seconds'] * 1000:.1f}ms")
+        for problem in result["problems"]:
+            print(f"[{name}]   {problem}")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(scene_files)} previews in {elapsed:.2f}s ({elapsed / max(1, len(scene_files)) * 1000:.1f}ms each), "
+          f"{failed} with problems")
+
+if __name__ == "__main__":
+    main()
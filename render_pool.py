@@ -0,0 +1,113 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List
+
+def render_job(scene: Dict[str, Any], job_id: str, output_dir: str, quality: str, use_cache: bool = True) -> Dict[str, Any]:
+    """Evaluate and render one scene in a worker process.
+
+    Each job renders into output_dir/job_id under its own output name, so jobs
+    never share files. Returns the image path and whether it came from the
+    render cache, with the render seconds that saved. Workers run one job at a
+    time, so the difference in the worker's cache counters belongs to this job.
+    """
+    import scene_renderer
+    from compute_position import evaluate_function_calls
+
+    cache = scene_renderer.render_cache
+    hits, seconds_saved = cache.hits, cache.seconds_saved
+    final_scene = evaluate_function_calls(scene)
+    media_dir = os.path.join(output_dir, job_id)
+    image_path = scene_renderer.render_scene(final_scene, media_dir, quality, f"Scene_{job_id}", use_cache=use_cache)
+    return {
+        "image_path": os.path.abspath(image_path),
+        "cached": cache.hits > hits,
+        "seconds_saved": cache.seconds_saved - seconds_saved,
+    }
+
+def _warm_up():
+    """Import manim and the renderer once per worker, before any job is timed."""
+    import scene_renderer
+
+def collect_scene_files(paths: List[str]) -> List[str]:
+    """Scene JSON files from the given files and directories (e.g. the output of batch.py).
+
+    In directories, *_final.json files are skipped when the unevaluated scene
+    is also there, since every job evaluates its scene anyway.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        directory_files = sorted(glob.glob(os.path.join(path, "*.json")))
+        for file_path in directory_files:
+            if file_path.endswith("_final.json") and file_path[:-len("_final.json")] + ".json" in directory_files:
+                continue
+            files.append(file_path)
+    return files
+
+def render_all(scene_files: List[str], output_dir: str = "renders", workers: int = os.cpu_count() or 2,
+               quality: str = "low_quality", use_cache: bool = True) -> List[Dict[str, Any]]:
+    """Render scene files across `workers` processes, collecting results as jobs finish.
+
+    Jobs are named after their file; files with the same name in different
+    directories get a numeric suffix (scene, scene_2, ...) so their outputs
+    stay apart.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_up) as pool:
+        futures = {}
+        job_ids = set()
+        for file_path in scene_files:
+            with open(file_path, 'r') as f:
+                scene = json.load(f)
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            job_id, copies = name, 1
+            while job_id in job_ids:
+                copies += 1
+                job_id = f"{name}_{copies}"
+            job_ids.add(job_id)
+            futures[pool.submit(render_job, scene, job_id, output_dir, quality, use_cache)] = job_id
+
+        for future in as_completed(futures):
+            job_id = futures[future]
+            try:
+                result = {"id": job_id, "ok": True, **future.result()}
+                print(f"[{job_id}] {result['image_path']}{' (cached)' if result['cached'] else ''}")
+            except Exception as e:
+                result = {"id": job_id, "ok": False, "error": str(e)}
+                print(f"[{job_id}] Error: {e}")
+            results.append(result)
+    return results
+
+def main():
+    """Command line entry point rendering many scenes on all cores."""
+    parser = argparse.ArgumentParser(description="Render scene JSON files on a pool of worker processes.")
+    parser.add_argument("paths", nargs="+", help="scene JSON files or directories of them (e.g. batch.py --output-dir)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="render worker processes")
+    parser.add_argument("--output-dir", default="renders", help="each job renders into its own subdirectory")
+    parser.add_argument("--quality", default="low_quality", help="manim quality preset")
+    parser.add_argument("--no-cache", action="store_true", help="always render, bypassing the render cache")
+    args = parser.parse_args()
+
+    scene_files = collect_scene_files(args.paths)
+    print(f"Rendering {len(scene_files)} scenes on {args.workers} workers")
+
+    start = time.perf_counter()
+    results = render_all(scene_files, args.output_dir, args.workers, args.quality, not args.no_cache)
+    elapsed = time.perf_counter() - start
+
+    succeeded = [result for result in results if result["ok"]]
+    cached = [result for result in succeeded if result["cached"]]
+    print(f"\nRendered {len(succeeded)}/{len(results)} scenes in {elapsed:.2f}s "
+          f"({len(results) / elapsed if elapsed else 0.0:.2f} scenes/s, {args.workers} workers)")
+    if not args.no_cache:
+        print(f"Render cache: {len(cached)} hits, "
+              f"{sum(result['seconds_saved'] for result in cached):.1f}s of rendering saved")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+# Preload everything a render needs in the parent so forked workers start warm
+import manim
+import scene_renderer
+from render_pool import render_job
+
+class RenderJob:
+    def __init__(self, job_id: str, scene: Dict[str, Any]):
+        self.job_id = job_id
+        self.scene = scene
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.image_path: Optional[str] = None
+        self.cached = False
+        self.error: Optional[str] = None
+        self.seconds = 0.0
+
+class RenderService:
+    """Bounded job queue in front of a pool of forked, pre-warmed render workers."""
+
+    def __init__(self, workers: int = 2, queue_size: int = 16, output_dir: str = "renders",
+                 quality: str = "low_quality", job_timeout: float = 300.0, history: int = 1000):
+        self.output_dir = output_dir
+        self.quality = quality
+        self.job_timeout = job_timeout
+        # Fork before any threads exist so workers inherit the preloaded modules
+        self.pool = multiprocessing.get_context("fork").Pool(workers)
+        self.jobs: "queue.Queue[RenderJob]" = queue.Queue(maxsize=queue_size)
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.render_seconds_saved = 0.0
+        self.latencies = deque(maxlen=history)
+        self.dispatchers = [threading.Thread(target=self._dispatch, daemon=True) for _ in range(workers)]
+        for dispatcher in self.dispatchers:
+            dispatcher.start()
+
+    def submit(self, scene: Dict[str, Any]) -> Optional[RenderJob]:
+        """Queue a scene for rendering; returns None when the queue is full."""
+        job = RenderJob(f"{os.getpid()}_{next(self.job_ids)}", scene)
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            return None
+        return job
+
+    def _dispatch(self):
+        while True:
+            job = self.jobs.get()
+            with self.lock:
+                self.in_flight += 1
+            result = None
+            try:
+                result = self.pool.apply_async(render_job, (job.scene, job.job_id, self.output_dir, self.quality))
+                rendered = result.get(self.job_timeout)
+                job.image_path = rendered["image_path"]
+                job.cached = rendered["cached"]
+            except multiprocessing.TimeoutError:
+                job.error = f"render timed out after {self.job_timeout:.0f}s"
+            except Exception as e:
+                job.error = str(e)
+            job.seconds = time.perf_counter() - job.submitted
+            with self.lock:
+                if job.error is None:
+                    self.completed += 1
+                    self.latencies.append(job.seconds)
+                    if job.cached:
+                        self.cache_hits += 1
+                        self.render_seconds_saved += rendered["seconds_saved"]
+                else:
+                    self.failed += 1
+            job.done.set()
+            if result is not None:
+                # A timed out render keeps its worker busy, so hold its slot until the worker is actually free
+                result.wait()
+            with self.lock:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                "queue_depth": self.jobs.qsize(),
+                "queue_capacity": self.jobs.maxsize,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "render_cache": {
+                    "hits": self.cache_hits,
+                    "hit_rate": self.cache_hits / self.completed if self.completed else 0.0,
+                    "seconds_saved": self.render_seconds_saved,
+                },
+            }
+        if latencies:
+            stats["latency_seconds"] = {
+                "mean": statistics.fmean(latencies),
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "max": latencies[-1],
+                "last": self.latencies[-1],
+            }
+        return stats
+
+def make_handler(service: RenderService):
+    class RenderHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, service.stats())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/render":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                scene = json.loads(self.rfile.read(length))
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send_json(400, {"error": f"Invalid JSON: {e}"})
+                return
+
+            job = service.submit(scene)
+            if job is None:
+                self._send_json(503, {"error": "render queue full"}, {"Retry-After": "1"})
+                return
+            job.done.wait()
+            if job.error is not None:
+                self._send_json(500, {"job_id": job.job_id, "error": job.error, "seconds": job.seconds})
+            else:
+                self._send_json(200, {"job_id": job.job_id, "image_path": job.image_path, "cached": job.cached,
+                                      "seconds": job.seconds})
+
+        def log_message(self, format, *args):
+            pass
+
+    return RenderHandler
+
+def main():
+    """Run the render daemon on localhost."""
+    parser = argparse.ArgumentParser(description="Keep manim warm and render scene JSON posted to /render.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="forked render worker processes")
+    parser.add_argument("--queue-size", type=int, default=16, help="queued jobs before /render answers 503")
+    parser.add_argument("--output-dir", default="renders", help="each job renders into its own subdirectory")
+    parser.add_argument("--quality", default="low_quality", help="manim quality preset")
+    args = parser.parse_args()
+
+    service = RenderService(args.workers, args.queue_size, args.output_dir, args.quality)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(service))
+    print(f"Render server listening on http://127.0.0.1:{args.port} (POST /render, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.pool.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1 @@
-python main.py
-python compute_position.py
-python generate_code.py
-manim generated_scene.py GeneratedScene -pql
\ No newline at end of file
+python pipeline.py --output-dir . --preview
\ No newline at end of file
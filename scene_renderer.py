@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import manim
+from manim import Arc, Circle, Dot, Line, Polygon, Scene, Text, VGroup, RIGHT, WHITE, tempconfig
+
+from cache import RenderCache, make_cache_key
+from compute_position import evaluate_function_call
+from generate_code import POLYGON_TYPES, semicircle_geometry
+from tracing import span
+
+render_cache = RenderCache(os.getenv("RENDER_CACHE_DIR", ".render_cache"))
+
+def resolve_color(name: str) -> Any:
+    """Map a color name from the JSON (e.g. "BLUE") to manim's constant, passing hex strings through."""
+    return getattr(manim, name, name)
+
+def _point(value: Any, default: List[float]) -> np.ndarray:
+    """A 3D point, evaluating leftover expression strings like the generated code does at runtime."""
+    if isinstance(value, str):
+        value = evaluate_function_call(value)
+    if value is None:
+        value = default
+    return np.array(value, dtype=float)
+
+def build_mobjects(scene_data: Dict[str, Any]) -> List[Any]:
+    """Build the mobjects generate_scene_code would emit, straight from evaluated scene data."""
+    entities = {entity["id"]: entity for entity in scene_data["entities"]}
+    mobjects = []
+
+    for entity_id, pos in scene_data["positions"].items():
+        entity_info = entities[entity_id]
+        entity_type = entity_info["type"]
+        color = resolve_color(entity_info.get("color", "WHITE"))
+
+        if entity_type == "circle":
+            center = pos["center"] if pos["center"] else [0, 0, 0]
+            center = np.array([center[0], center[1], 0], dtype=float)
+            circle = Circle(radius=float(pos["radius"])).move_to(center)
+            circle.set_stroke(color=color)
+            circle.set_fill(color, opacity=0.3)
+            center_dot = Dot(point=center, color=WHITE)
+            mobjects += [circle, center_dot, Text('O', font_size=24).next_to(center_dot, RIGHT)]
+
+        elif entity_type == "semicircle":
+            center = pos["center"] if pos["center"] else [0, 0, 0]
+            radius = pos["radius"]
+            start_angle, diameter_start, diameter_end = semicircle_geometry(
+                center, radius, entity_info.get("orientation", "up")
+            )
+            arc = Arc(radius=radius, start_angle=start_angle, angle=np.pi,
+                      arc_center=np.array([center[0], center[1], 0], dtype=float))
+            semicircle = VGroup(arc, Line(np.array(diameter_start, dtype=float), np.array(diameter_end, dtype=float)))
+            semicircle.set_color(color)
+            semicircle.set_fill(color, opacity=0.3)
+            mobjects.append(semicircle)
+
+        elif entity_type in POLYGON_TYPES:
+            polygon = Polygon(*[np.array(vertex, dtype=float) for vertex in pos["vertices"]])
+            polygon.set_stroke(color, width=2)
+            polygon.set_fill(color, opacity=0.3)
+            mobjects.append(polygon)
+
+        elif entity_type == "point":
+            dot = Dot(point=_point(pos["coordinates"], [0, 0, 0]), color=color)
+            mobjects += [dot, Text(entity_id, font_size=24).next_to(dot, RIGHT)]
+
+        elif entity_type == "line":
+            endpoints = pos["endpoints"]
+            if isinstance(endpoints, str):
+                endpoints = evaluate_function_call(endpoints) or [[0, 0, 0], [1, 0, 0]]
+            line = Line(_point(endpoints[0], [0, 0, 0]), _point(endpoints[1], [1, 0, 0]))
+            line.set_stroke(color=color)
+            mobjects.append(line)
+
+    return mobjects
+
+class JSONScene(Scene):
+    """A scene whose mobjects come from evaluated scene data instead of generated code."""
+
+    def __init__(self, scene_data: Dict[str, Any], **kwargs):
+        self.scene_data = scene_data
+        super().__init__(**kwargs)
+
+    def construct(self):
+        for mobject in build_mobjects(self.scene_data):
+            self.add(mobject)
+
+def render_cache_key(scene_data: Dict[str, Any], quality: str) -> str:
+    """Hash of everything that determines the rendered image.
+
+    make_cache_key sorts dict keys, so the order of the positions (which is
+    the drawing order) is hashed separately.
+    """
+    return make_cache_key("render", scene_data, list(scene_data.get("positions", {})), quality, manim.__version__)
+
+def render_scene(scene_data: Dict[str, Any], media_dir: str = "media", quality: str = "low_quality",
+                 output_name: str = "GeneratedScene", preview: bool = False, use_cache: bool = True) -> str:
+    """Render evaluated scene data inside this process and return the image path.
+
+    Scenes already in render_cache return the cached image without invoking
+    manim. Scenes rendered into the same media_dir need distinct output names.
+    manim's config is process global, so concurrent renders need separate
+    processes (each with its own media_dir).
+    """
+    with span("render", quality=quality) as render_span:
+        key = render_cache_key(scene_data, quality)
+        if use_cache:
+            cached_path = render_cache.get(key)
+            render_span.set(cached=cached_path is not None)
+            if cached_path is not None:
+                if preview:
+                    from manim.utils.file_ops import open_file
+                    open_file(cached_path)
+                return cached_path
+
+        start = time.perf_counter()
+        with tempconfig({"media_dir": media_dir, "quality": quality, "preview": preview, "output_file": output_name}):
+            scene = JSONScene(scene_data)
+            scene.render()
+            image_path = str(scene.renderer.file_writer.image_file_path)
+        if use_cache:
+            render_cache.put(key, image_path, time.perf_counter() - start)
+        return image_path
+
+def print_render_cache_stats():
+    """Print the render cache hit rate and the render time it saved in this process."""
+    stats = render_cache.stats()
+    print(f"Render cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+          f"{stats['seconds_saved']:.1f}s of rendering saved, {stats['entries']} images, {stats['bytes'] / 1e6:.1f} MB")
+
+def main():
+    """Render evaluated scene JSON files (e.g. *_final.json) one after another in this process."""
+    parser = argparse.ArgumentParser(description="Render evaluated scene JSON files without generating code.")
+    parser.add_argument("paths", nargs="+", help="evaluated scene JSON files")
+    parser.add_argument("--media-dir", default="media")
+    parser.add_argument("--quality", default="low_quality", help="manim quality preset")
+    parser.add_argument("--no-cache", action="store_true", help="always render, bypassing the render cache")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for path in args.paths:
+        with open(path, 'r') as f:
+            scene_data = json.load(f)
+        output_name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            image_path = render_scene(scene_data, args.media_dir, args.quality, output_name, use_cache=not args.no_cache)
+            print(f"{path} -> {image_path}")
+        except Exception as e:
+            print(f"Error rendering {path}: {e}")
+    print(f"Rendered {len(args.paths)} scenes in {time.perf_counter() - start:.2f}s")
+    if not args.no_cache:
+        print_render_cache_stats()
+
+if __name__ == "__main__":
+    main()
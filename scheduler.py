@@ -0,0 +1,214 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from few_shot_index import estimate_tokens
+from llm_client import get_client
+from main import build_messages, generate_json_schema, get_api_config, select_few_shot_examples
+
+# The request whose generate_json_schema call is running in this worker, for attributing responses
+_current_request: contextvars.ContextVar[Optional["ScheduledRequest"]] = contextvars.ContextVar("current_request", default=None)
+
+# Typical completion length (chain of thought + JSON) charged up front; corrected from usage afterwards
+EXPECTED_COMPLETION_TOKENS = 800
+
+def estimate_request_tokens(description: str, completion_tokens: int = EXPECTED_COMPLETION_TOKENS) -> int:
+    """Tokens a generate_json_schema call for this description is expected to use.
+
+    The prompt is built exactly as generate_json_schema builds it, so the
+    estimate follows the size of the selected few-shot examples.
+    """
+    messages = build_messages(description, select_few_shot_examples(description).text)
+    return sum(estimate_tokens(message["content"]) for message in messages) + completion_tokens
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to one minute's worth. Not thread safe on its own."""
+
+    def __init__(self, rate_per_minute: float):
+        # The budget the caller configured; server limits can only lower it
+        self.configured = float(rate_per_minute)
+        self.capacity = self.configured
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (amounts above capacity only need a full bucket)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        """Take `amount` (negative to refund); the level may go negative, which is repaid before anything else is taken."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+    def limit_to(self, remaining: float, limit: Optional[float] = None):
+        """Adopt the server's view: never hold more than it says remains or refill faster than its limit."""
+        self._refill()
+        if limit is not None and limit > 0:
+            self.capacity = min(self.configured, float(limit))
+            self.rate = self.capacity / 60.0
+        self.level = min(self.level, self.capacity, float(remaining))
+
+class ScheduledRequest:
+    def __init__(self, description: str, priority: int, tokens: int, kwargs: Dict[str, Any]):
+        self.description = description
+        self.priority = priority
+        self.tokens = tokens
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.submitted = time.perf_counter()
+        # HTTP responses received for this request; the first was charged at dispatch
+        self.responses = 0
+        # Run in the submitter's context so tracing spans nest under the caller's
+        self.context = contextvars.copy_context()
+
+class RateLimitScheduler:
+    """Sends generate_json_schema calls within requests-per-minute and tokens-per-minute budgets.
+
+    Requests wait in a priority queue (lower priority values go first, FIFO
+    within a priority) and are released only when both token buckets can cover
+    them and a worker is free, so requests that cannot be sent yet keep their
+    priority order. Buckets are charged the estimated token cost up front and
+    corrected with the reported usage afterwards; cache hits and fast path parses are refunded.
+    Schema re-asks and client retries are charged one request each as their
+    responses arrive, and re-ask tokens when the request settles. The client's
+    x-ratelimit-* headers cap the buckets at what the server says remains, and
+    a 429 pauses all dispatch until its Retry-After has passed.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 model_name: str = "llama-3.1-8b-instant", max_in_flight: int = 8):
+        self.model_name = model_name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.queue: List[Any] = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.paused_until = 0.0
+        self.closed = False
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.counters = {"submitted": 0, "sent": 0, "extra_requests": 0, "cache_hits": 0, "fast_path": 0,
+                         "rate_limited": 0,
+                         "estimated_tokens": 0, "actual_tokens": 0, "queue_seconds": 0.0}
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.client = get_client(get_api_config(model_name))
+        self.client.rate_limit_listeners.append(self._on_rate_limits)
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, description: str, priority: int = 0, **kwargs) -> Future:
+        """Queue a generate_json_schema(description, ...) call; returns a Future for the schema."""
+        request = ScheduledRequest(description, priority, estimate_request_tokens(description), kwargs)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("scheduler is shut down")
+            heapq.heappush(self.queue, (priority, next(self.sequence), request))
+            self.counters["submitted"] += 1
+            self.condition.notify()
+        return request.future
+
+    def _dispatch(self):
+        while True:
+            with self.condition:
+                # Hold requests here until a worker is free, not in the executor's FIFO queue
+                while not (self.queue and self.in_flight < self.max_in_flight):
+                    if self.closed and not self.queue:
+                        return
+                    self.condition.wait()
+                request = self.queue[0][2]
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(request.tokens),
+                           self.paused_until - time.monotonic())
+                if wait > 0:
+                    # Re-check after the wait: a higher priority request or new headers may arrive meanwhile
+                    self.condition.wait(wait)
+                    continue
+                heapq.heappop(self.queue)
+                self.in_flight += 1
+                self.requests.take(1)
+                self.tokens.take(request.tokens)
+                self.counters["sent"] += 1
+                self.counters["estimated_tokens"] += request.tokens
+                self.counters["queue_seconds"] += time.perf_counter() - request.submitted
+            self.executor.submit(request.context.run, self._run, request)
+
+    def _run(self, request: ScheduledRequest):
+        _current_request.set(request)
+        metrics = request.kwargs.pop("metrics", None)
+        metrics = metrics if metrics is not None else {}
+        try:
+            result = generate_json_schema(request.description, self.model_name, metrics=metrics,
+                                          **{"verbose": False, **request.kwargs})
+        except Exception as e:
+            request.future.set_exception(e)
+            return
+        finally:
+            self._settle(request, metrics)
+        request.future.set_result(result)
+
+    def _settle(self, request: ScheduledRequest, metrics: Dict[str, Any]):
+        """Correct the buckets once the real cost of a request is known and free its worker."""
+        with self.condition:
+            self.in_flight -= 1
+            if metrics.get("reask_tokens"):
+                self.tokens.take(metrics["reask_tokens"])
+            if metrics.get("cache_hit") or metrics.get("fast_path"):
+                # Answered without an API call (response cache, template or fast path rule)
+                self.requests.take(-1)
+                self.tokens.take(-request.tokens)
+                self.counters["fast_path" if metrics.get("fast_path") else "cache_hits"] += 1
+            elif metrics.get("prompt_tokens"):
+                actual = metrics["prompt_tokens"] + metrics.get("completion_tokens", 0)
+                self.tokens.take(actual - request.tokens)
+                self.counters["actual_tokens"] += actual
+            self.condition.notify()
+
+    def _on_rate_limits(self, rate_limits: Dict[str, Any], status_code: int):
+        request = _current_request.get()
+        with self.condition:
+            if request is not None:
+                request.responses += 1
+                if request.responses > 1:
+                    # A re-ask or retry of a request that was charged once at dispatch
+                    self.requests.take(1)
+                    self.counters["extra_requests"] += 1
+            # Groq's request limit headers count per day, so only the remaining count is used
+            if "remaining_requests" in rate_limits:
+                self.requests.limit_to(rate_limits["remaining_requests"])
+            if "remaining_tokens" in rate_limits:
+                self.tokens.limit_to(rate_limits["remaining_tokens"], rate_limits.get("limit_tokens"))
+            if status_code == 429:
+                self.counters["rate_limited"] += 1
+                pause = rate_limits.get("retry_after", rate_limits.get("reset_tokens", 1.0))
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.condition.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            stats = dict(self.counters)
+            stats["queued"] = len(self.queue)
+            stats["in_flight"] = self.in_flight
+            stats["request_budget"] = self.requests.level
+            stats["token_budget"] = self.tokens.level
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting requests; queued ones are still sent."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if wait:
+            self.dispatcher.join()
+        self.executor.shutdown(wait=wait)
+        self.client.rate_limit_listeners.remove(self._on_rate_limits)
@@ -0,0 +1,154 @@
+import ast
+import inspect
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+from helper_functions import HELPER_FUNCTIONS
+from expressions import MATH_FUNCTIONS, find_references
+from generate_code import ENTITY_POSITION_FIELDS
+
+# Helper functions offered to the model, in prompt order, with the positional
+# arguments it must pass. main.SYSTEM_PROMPT lists its function catalog and
+# arity table from this, so the prompt and the validator cannot disagree.
+PROMPT_FUNCTIONS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("get_square_vertices", ("center", "side_length", "orientation")),
+    ("get_rectangle_vertices", ("center", "length", "width", "orientation")),
+    ("get_equilateral_triangle_vertices", ("center", "side_length", "orientation")),
+    ("get_isosceles_triangle_vertices", ("center", "equal_sides", "base", "orientation")),
+    ("get_right_triangle_vertices", ("center", "base", "height", "orientation")),
+    ("get_inscribed_circle", ("vertices",)),
+    ("get_circumscribed_circle", ("vertices",)),
+    ("get_common_chord", ("circle1_center", "circle1_radius", "circle2_center", "circle2_radius")),
+    ("get_chord_from_center_distance", ("circle_center", "circle_radius", "distance_from_center")),
+    ("get_chord_from_length", ("circle_center", "circle_radius", "chord_length")),
+    ("get_tangent_by_point", ("circle_center", "circle_radius", "external_point")),
+    ("get_tangent_by_angle_between_tangents", ("circle_center", "circle_radius", "angle")),
+    ("get_tangent_by_angle_with_radius", ("circle_center", "circle_radius", "angle")),
+    ("get_tangent_by_distance_from_center", ("circle_center", "circle_radius", "distance_from_center")),
+    ("get_tangent_by_length_of_tangent", ("circle_center", "circle_radius", "length_of_tangent")),
+]
+
+def function_catalog() -> str:
+    """The numbered function signatures listed in the system prompt."""
+    return "\n".join(f"{index}. {name}({', '.join(params)})"
+                     for index, (name, params) in enumerate(PROMPT_FUNCTIONS, start=1))
+
+def arity_table() -> str:
+    """The numbered argument counts listed in the system prompt."""
+    return "\n".join(f"{index}. {name}: {len(params)}"
+                     for index, (name, params) in enumerate(PROMPT_FUNCTIONS, start=1))
+
+def _arity_range(func) -> Tuple[int, int]:
+    parameters = inspect.signature(func).parameters.values()
+    return (sum(1 for parameter in parameters if parameter.default is inspect.Parameter.empty),
+            len(parameters))
+
+class SchemaValidator:
+    """Checks an extracted schema before anything is evaluated.
+
+    Lookup tables are built once: argument counts for every callable name
+    (exact for the functions in the prompt, the Python signature for other
+    helpers) and the position fields generate_code reads per entity type.
+    Expression checks are cached per expression string.
+    """
+
+    def __init__(self):
+        self.arity: Dict[str, Tuple[int, int]] = {name: _arity_range(func) for name, func in HELPER_FUNCTIONS.items()}
+        self.arity.update({name: (len(params), len(params)) for name, params in PROMPT_FUNCTIONS})
+        self.arity.update({name: (1, 1) for name in MATH_FUNCTIONS})
+        self.position_fields = ENTITY_POSITION_FIELDS
+
+    def validate(self, json_schema: Any) -> List[str]:
+        """Return a list of problems, each naming where it is; empty if the schema is well formed."""
+        if not isinstance(json_schema, dict):
+            return ["the top level must be a JSON object"]
+        problems = [f'missing top-level "{key}"' for key in ("entities", "positions") if key not in json_schema]
+        entities = json_schema.get("entities", [])
+        positions = json_schema.get("positions", {})
+        if not isinstance(entities, list):
+            problems.append('"entities" must be a list')
+            entities = []
+        if not isinstance(positions, dict):
+            problems.append('"positions" must be an object')
+            positions = {}
+
+        entity_types = {}
+        for index, entity in enumerate(entities):
+            if not isinstance(entity, dict) or not isinstance(entity.get("id"), str):
+                problems.append(f"entities[{index}]: every entity needs a string \"id\"")
+                continue
+            if entity["id"] in entity_types:
+                problems.append(f"entities[{index}]: duplicate id {entity['id']!r}")
+            entity_types[entity["id"]] = entity.get("type")
+
+        for entity_id, position in positions.items():
+            if entity_id not in entity_types:
+                problems.append(f"positions.{entity_id}: no entity with this id")
+                continue
+            entity_type = entity_types[entity_id]
+            if entity_type not in self.position_fields:
+                problems.append(f"entities.{entity_id}: unknown type {entity_type!r} "
+                                f"(expected one of {', '.join(self.position_fields)})")
+                continue
+            if not isinstance(position, dict):
+                problems.append(f"positions.{entity_id}: must be an object with {', '.join(self.position_fields[entity_type])}")
+                continue
+            for field in self.position_fields[entity_type]:
+                if field not in position:
+                    problems.append(f"positions.{entity_id}: missing \"{field}\" for a {entity_type}")
+            for field, value in position.items():
+                problems += [f"positions.{entity_id}.{field}: {problem}"
+                             for problem in self._value_problems(value, entity_types)]
+        return problems
+
+    def _value_problems(self, value: Any, entity_types: Dict[str, Any]) -> List[str]:
+        if isinstance(value, list):
+            return [problem for item in value for problem in self._value_problems(item, entity_types)]
+        if not isinstance(value, str):
+            return []
+        problems = list(self._expression_problems(value))
+        # Only the referenced ids are cached; whether they exist differs per schema
+        problems += [f"{value!r}: refers to unknown entity {reference}"
+                     for reference in self._references(value) if reference not in entity_types]
+        return problems
+
+    @lru_cache(maxsize=8192)
+    def _references(self, expression: str) -> Tuple[str, ...]:
+        return tuple(sorted(find_references(expression)))
+
+    @lru_cache(maxsize=8192)
+    def _expression_problems(self, expression: str) -> Tuple[str, ...]:
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError:
+            # Not an expression, left as it is by compute_position
+            return ()
+        if isinstance(tree.body, ast.Constant) and isinstance(tree.body.value, (int, float)):
+            return (f"{expression!r}: numbers must be plain JSON numbers, not strings",)
+        if isinstance(tree.body, ast.List) and all(isinstance(item, ast.Constant) for item in tree.body.elts):
+            return (f"{expression!r}: coordinates must be JSON arrays of numbers, not strings",)
+
+        problems = []
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call):
+                continue
+            if not isinstance(node.func, ast.Name):
+                problems.append(f"{expression!r}: only named functions can be called")
+                continue
+            name = node.func.id
+            if name not in self.arity:
+                problems.append(f"{expression!r}: unknown function {name}")
+            elif node.keywords:
+                problems.append(f"{expression!r}: {name} takes positional arguments only")
+            else:
+                low, high = self.arity[name]
+                if not low <= len(node.args) <= high:
+                    expected = str(low) if low == high else f"{low} to {high}"
+                    problems.append(f"{expression!r}: {name} takes {expected} arguments, got {len(node.args)}")
+        return tuple(problems)
+
+validator = SchemaValidator()
+
+def validate_schema(json_schema: Any) -> List[str]:
+    """Problems in an extracted schema that would break evaluation or code generation."""
+    return validator.validate(json_schema)
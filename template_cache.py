@@ -0,0 +1,263 @@
+import ast
+import json
+import math
+import os
+import re
+import threading
+from string import Template
+from typing import Dict, Any, List, Optional, Tuple
+
+from cache import DiskCache, make_cache_key
+from compute_position import LENGTH_KEYS
+from helper_functions import HELPER_FUNCTIONS
+from schema_validator import validate_schema
+
+# Numbers in a prompt (units may follow directly, as in 3cm); a leading minus stays part of the template text
+PROMPT_NUMBER = re.compile(r'(?<![\w.])\d+(?:\.\d+)?(?!\.?\d)')
+# Point names such as P, A', AB or ABC (a run of capitals is one name per letter)
+PROMPT_NAME = re.compile(r"(?<![\w'])([A-Z]{1,3})('?)(?![\w'])")
+# Sentence-initial "A" / "I" are words, not point names
+SENTENCE_START = re.compile(r'(^|[.!?]\s+)$')
+
+# Point names in the schema's JSON text (ids such as T1 are left alone)
+SCHEMA_NAME = re.compile(r"(?<![\w$'])([A-Z]{1,3})(?![\w])")
+
+# Entity fields holding counts rather than measurements, kept as they are
+COUNT_KEYS = ("sides",)
+
+# Numeric JSON values that become "\0slot:<name>" strings while a schema is parameterized
+SLOT_MARKER = "\0slot:"
+SLOT_STRING = re.compile(r'"\\u0000slot:(-?)(\w+)"')
+
+# Radian literals are matched to degree values within this tolerance (models round to ~4 places)
+RADIAN_TOLERANCE = 5e-4
+
+def normalize_prompt(description: str) -> Tuple[str, List[float], List[str]]:
+    """Split a prompt into a template with numbers and point names replaced by slots, plus the slot values.
+
+    Returns (template, numbers, names): "${n0}" marks numbers[0] and "${p0}"
+    the first distinct point-name letter, so prompts that differ only in
+    values and labels share a template.
+    """
+    text = " ".join(description.split())
+    numbers = []
+
+    def number_slot(match):
+        numbers.append(float(match.group(0)))
+        return f"${{n{len(numbers) - 1}}}"
+
+    text = PROMPT_NUMBER.sub(number_slot, text.replace("$", "$$"))
+
+    names: List[str] = []
+
+    def name_slot(match):
+        letters, prime = match.groups()
+        if letters in ("A", "I") and SENTENCE_START.search(match.string[:match.start()]):
+            return match.group(0)
+        slots = []
+        for letter in letters:
+            if letter + prime not in names:
+                names.append(letter + prime)
+            slots.append(f"${{p{names.index(letter + prime)}}}")
+        return "".join(slots)
+
+    text = PROMPT_NAME.sub(name_slot, text)
+    return text, numbers, names
+
+def _number_candidates(literal: float, numbers: List[float]) -> List[str]:
+    """Slots a schema literal can be expressed as: a prompt number, or its conversion to radians."""
+    candidates = []
+    for index, value in enumerate(numbers):
+        if abs(abs(literal) - value) < 1e-9:
+            candidates.append(f"n{index}")
+        elif value and abs(abs(literal) - math.radians(value)) < RADIAN_TOLERANCE:
+            candidates.append(f"r{index}")
+    return candidates
+
+class _NotParameterizable(Exception):
+    """A number in the schema cannot be tied to exactly one prompt value."""
+
+def _slot(literal: float, numbers: List[float]) -> str:
+    """The single slot a measurement is written as; raises _NotParameterizable otherwise."""
+    candidates = _number_candidates(literal, numbers)
+    if len(candidates) != 1:
+        raise _NotParameterizable(literal)
+    return candidates[0]
+
+def _is_measure(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value != 0
+
+def _parameterize_expression(expression: str, numbers: List[float]) -> str:
+    """An expression string with the scalar arguments of its helper calls replaced by slots.
+
+    Only a number that is itself an argument (e.g. the 3 in
+    get_circle_point(C, 3, 45)) is slotted. Non-zero numbers inside coordinate
+    lists refuse the schema, as do numbers inside arithmetic or math calls
+    that equal a prompt value (the 2 in 2 * sqrt(2) may be the radius or a
+    constant). Strings that are not expressions are labels and are kept as
+    they are.
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        return expression.replace("$", "$$")
+    text = expression.encode('utf-8')
+    replacements = []
+    subscripts, in_lists, helper_args = set(), set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in HELPER_FUNCTIONS:
+            for arg in node.args:
+                if isinstance(arg, ast.UnaryOp) and isinstance(arg.op, ast.USub):
+                    arg = arg.operand
+                if isinstance(arg, ast.Constant):
+                    helper_args.add(id(arg))
+        if isinstance(node, (ast.List, ast.Tuple)):
+            in_lists.update(id(child) for child in ast.walk(node))
+        # Indices inside a subscript ([0][1]) are structure, not measurements
+        if isinstance(node, ast.Subscript):
+            subscripts.update(id(child) for child in ast.walk(node.slice))
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Constant) or not _is_measure(node.value) or id(node) in subscripts:
+            continue
+        if id(node) in in_lists:
+            # A coordinate inside a list argument or literal
+            raise _NotParameterizable(node.value)
+        if id(node) not in helper_args:
+            # A constant in arithmetic stays as it is, unless it could be a prompt value
+            if _number_candidates(node.value, numbers):
+                raise _NotParameterizable(node.value)
+            continue
+        replacements.append((node.col_offset, node.end_col_offset, f"${{{_slot(node.value, numbers)}}}"))
+    pieces, last = [], 0
+    for start, end, slot in sorted(replacements):
+        pieces += [text[last:start].decode('utf-8').replace("$", "$$"), slot]
+        last = end
+    pieces.append(text[last:].decode('utf-8').replace("$", "$$"))
+    return "".join(pieces)
+
+def _parameterize_value(value: Any, key: Optional[str], numbers: List[float], in_list: bool = False) -> Any:
+    if isinstance(value, dict):
+        return {item_key.replace("$", "$$"): _parameterize_value(item, item_key, numbers)
+                for item_key, item in value.items()}
+    if isinstance(value, list):
+        return [_parameterize_value(item, key, numbers, in_list=True) for item in value]
+    if isinstance(value, str):
+        return _parameterize_expression(value, numbers)
+    if not _is_measure(value) or key in COUNT_KEYS:
+        return value
+    if in_list:
+        # Literal coordinates are placed by the model and would not follow new values
+        raise _NotParameterizable(value)
+    if key in LENGTH_KEYS:
+        return f"{SLOT_MARKER}{'-' if value < 0 else ''}{_slot(value, numbers)}"
+    if _number_candidates(value, numbers):
+        # Styling values (e.g. opacity) stay as they are, unless they could be a prompt value
+        raise _NotParameterizable(value)
+    return value
+
+def parameterize_schema(json_schema: Dict[str, Any], numbers: List[float], names: List[str]) -> Optional[str]:
+    """The schema's JSON text with numbers and point names replaced by the prompt's slots.
+
+    Only measurements are slotted: scalar arguments of helper calls and
+    length fields such as "radius" or "length". Returns None if one of them
+    does not map to exactly one prompt number (a value the model derived),
+    if a literal coordinate is non-zero (it would not follow new values),
+    if another number equals a prompt value, or if two prompt numbers are
+    equal.
+    """
+    if len(set(numbers)) != len(numbers):
+        return None
+    try:
+        parameterized = _parameterize_value(json_schema, None, numbers)
+    except _NotParameterizable:
+        return None
+    text = SLOT_STRING.sub(lambda match: f"{match.group(1)}${{{match.group(2)}}}", json.dumps(parameterized))
+
+    def name_slot(match):
+        if not all(letter in names for letter in match.group(1)):
+            return match.group(0)
+        return "".join(f"${{p{names.index(letter)}}}" for letter in match.group(1))
+
+    # Primed names (A') are only substituted when written together with the prime
+    for index, name in enumerate(names):
+        if name.endswith("'"):
+            text = re.sub(rf"(?<![\w$]){re.escape(name)}", f"${{p{index}}}", text)
+    return SCHEMA_NAME.sub(name_slot, text)
+
+def fill_schema(parameterized: str, numbers: List[float], names: List[str]) -> Dict[str, Any]:
+    """Substitute a new prompt's values into a parameterized schema."""
+    values: Dict[str, Any] = {}
+    for index, value in enumerate(numbers):
+        values[f"n{index}"] = int(value) if value.is_integer() else value
+        values[f"r{index}"] = round(math.radians(value), 4)
+    values.update({f"p{index}": name for index, name in enumerate(names)})
+    return json.loads(Template(parameterized).substitute(values))
+
+class TemplateCache:
+    """Parameterized schemas keyed on the prompt template and the prompt context, stored in a DiskCache.
+
+    The context is everything besides the question that shaped the answer
+    (endpoint, model, system prompt, few-shot text, sampling params), so
+    templates do not outlive prompt changes. A prompt that differs from an
+    earlier one only in its numbers and point names gets the earlier schema
+    with its own values filled in, without an LLM call. Counters cover
+    lookups in this process.
+    """
+
+    def __init__(self, directory: str = ".template_cache"):
+        self.cache = DiskCache(directory)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.not_parameterizable = 0
+
+    def _key(self, template: str, context: Any) -> str:
+        return make_cache_key("template", context, template)
+
+    def get(self, description: str, context: Any) -> Optional[Dict[str, Any]]:
+        """The cached schema for the prompt's template filled with its values, or None.
+
+        A filled schema that fails validation (e.g. a name collision) counts as a miss.
+        """
+        template, numbers, names = normalize_prompt(description)
+        parameterized = self.cache.get(self._key(template, context))
+        json_schema = None
+        if parameterized is not None:
+            try:
+                json_schema = fill_schema(parameterized, numbers, names)
+            except (KeyError, ValueError):
+                json_schema = None
+            if json_schema is not None and validate_schema(json_schema):
+                json_schema = None
+        with self.lock:
+            if json_schema is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json_schema
+
+    def put(self, description: str, context: Any, json_schema: Dict[str, Any]) -> bool:
+        """Store the schema under the prompt's template if it can be parameterized; returns whether it was."""
+        template, numbers, names = normalize_prompt(description)
+        parameterized = parameterize_schema(json_schema, numbers, names)
+        with self.lock:
+            if parameterized is None:
+                self.not_parameterizable += 1
+                return False
+            self.stored += 1
+        self.cache.put(self._key(template, context), parameterized)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stored": self.stored,
+                "not_parameterizable": self.not_parameterizable,
+            }
+
+template_cache = TemplateCache(os.getenv("TEMPLATE_CACHE_DIR", ".template_cache"))
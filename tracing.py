@@ -0,0 +1,198 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+# Upper bounds (seconds) of the duration histogram buckets in the metrics file
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Span attributes that are summed into the token counters
+TOKEN_ATTRIBUTES = ("prompt_tokens", "cached_prompt_tokens", "completion_tokens")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+class Histogram:
+    """Cumulative Prometheus-style histogram."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def lines(self, name: str, labels: str = "") -> List[str]:
+        bucket_labels = f"{labels}," if labels else ""
+        total_labels = f"{{{labels}}}" if labels else ""
+        lines = [f'{name}_bucket{{{bucket_labels}le="{bound}"}} {count}'
+                 for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{bucket_labels}le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{total_labels} {self.sum}')
+        lines.append(f'{name}_count{total_labels} {self.count}')
+        return lines
+
+class Tracer:
+    """Writes finished spans as JSON lines and keeps metrics for a Prometheus text file.
+
+    The metrics file is rewritten whenever a root span (one without a parent)
+    finishes and when the process exits.
+    """
+
+    def __init__(self, trace_path: str, metrics_path: str):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.lock = threading.Lock()
+        self.durations: Dict[str, Histogram] = defaultdict(Histogram)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.tokens: Dict[str, int] = defaultdict(int)
+        self.first_token = Histogram()
+        for path in (trace_path, metrics_path):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, span: "Span"):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self.lock:
+            with open(self.trace_path, 'a') as f:
+                f.write(line)
+            self.durations[span.name].observe(span.duration)
+            if span.status != "ok":
+                self.errors[span.name] += 1
+            for key in TOKEN_ATTRIBUTES:
+                if span.attributes.get(key):
+                    self.tokens[key] += span.attributes[key]
+            if span.attributes.get("first_token_seconds") is not None:
+                self.first_token.observe(span.attributes["first_token_seconds"])
+        if span.parent_id is None:
+            self.write_metrics()
+
+    def metrics_text(self) -> str:
+        lines = [
+            "# HELP text2manim_span_duration_seconds Duration of pipeline stages.",
+            "# TYPE text2manim_span_duration_seconds histogram",
+        ]
+        with self.lock:
+            for name, histogram in sorted(self.durations.items()):
+                lines += histogram.lines("text2manim_span_duration_seconds", f'span="{name}"')
+            lines += [
+                "# HELP text2manim_span_errors_total Stages that raised.",
+                "# TYPE text2manim_span_errors_total counter",
+            ]
+            lines += [f'text2manim_span_errors_total{{span="{name}"}} {count}' for name, count in sorted(self.errors.items())]
+            lines += [
+                "# HELP text2manim_llm_tokens_total LLM tokens by kind.",
+                "# TYPE text2manim_llm_tokens_total counter",
+            ]
+            lines += [f'text2manim_llm_tokens_total{{kind="{key[:-len("_tokens")]}"}} {self.tokens[key]}'
+                      for key in TOKEN_ATTRIBUTES]
+            lines += [
+                "# HELP text2manim_llm_first_token_seconds Time to first streamed token.",
+                "# TYPE text2manim_llm_first_token_seconds histogram",
+            ]
+            lines += self.first_token.lines("text2manim_llm_first_token_seconds")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self):
+        """Atomically rewrite the Prometheus text file."""
+        tmp_path = f"{self.metrics_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.metrics_text())
+        os.replace(tmp_path, self.metrics_path)
+
+class Span:
+    """A timed pipeline stage. Use as a context manager; add attributes with set()."""
+
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "start_time",
+                 "start", "duration", "status", "_token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        self.duration = 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self._token = _current_span.set(self)
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "error"
+            self.attributes["error"] = str(exc)
+        if _tracer is not None:
+            _tracer.record(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+        }
+
+class _NoopSpan:
+    """Stand-in returned by span() while tracing is disabled."""
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+_tracer: Optional[Tracer] = None
+
+def configure(trace_dir: Optional[str]):
+    """Write spans to trace_dir/traces.jsonl and metrics to trace_dir/metrics.prom; None disables tracing."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.write_metrics()
+    _tracer = None
+    if trace_dir:
+        _tracer = Tracer(os.path.join(trace_dir, "traces.jsonl"), os.path.join(trace_dir, "metrics.prom"))
+
+def enabled() -> bool:
+    return _tracer is not None
+
+def span(name: str, **attributes):
+    """Time a stage as a child of the current span. Costs one global check when tracing is off."""
+    if _tracer is None:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+@atexit.register
+def _flush():
+    if _tracer is not None:
+        _tracer.write_metrics()
+
+configure(os.getenv("TRACE_DIR"))